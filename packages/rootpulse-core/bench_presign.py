@@ -0,0 +1,43 @@
+"""
+Benchmark presigned URL generation: boto3 per call vs StorageService.get_download_urls.
+
+Signing is local in both cases, so no MinIO server is needed.
+
+    python bench_presign.py [urls_per_page] [pages]
+"""
+import sys
+import time
+from rootpulse_core.storage import StorageService
+
+def run_benchmark(urls_per_page, pages):
+    service = StorageService(endpoint="http://localhost:9000", bucket="bench")
+    names = [f"media/products/{i}/photo.jpg" for i in range(urls_per_page)]
+
+    started = time.perf_counter()
+    for _ in range(pages):
+        for name in names:
+            service.s3.meta.client.generate_presigned_url(
+                'get_object', Params={'Bucket': service.bucket, 'Key': name}, ExpiresIn=3600
+            )
+    boto = time.perf_counter() - started
+
+    started = time.perf_counter()
+    for _ in range(pages):
+        service.get_download_urls(names, expires_in=3600, bucket_seconds=0)
+    uncached = time.perf_counter() - started
+
+    started = time.perf_counter()
+    for _ in range(pages):
+        service.get_download_urls(names, expires_in=3600)
+    cached = time.perf_counter() - started
+
+    total = urls_per_page * pages
+    print(f"URLs: {urls_per_page} per page x {pages} pages")
+    print(f"  boto3 per call:         {boto:.3f}s ({total / boto:.0f} URLs/s)")
+    print(f"  Local signing, no cache: {uncached:.3f}s ({total / uncached:.0f} URLs/s)")
+    print(f"  Local signing, bucketed: {cached:.3f}s ({total / cached:.0f} URLs/s)")
+
+if __name__ == "__main__":
+    urls_per_page = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    pages = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+    run_benchmark(urls_per_page, pages)
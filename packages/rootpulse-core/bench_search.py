@@ -0,0 +1,66 @@
+"""
+Benchmark MeilisearchService against a local stand-in Meilisearch server.
+
+The stand-in answers /indexes/{uid}/search after a fixed delay, so the numbers show
+how concurrent searches overlap on the event loop rather than Meilisearch speed.
+
+    python bench_search.py [concurrency] [latency_ms]
+"""
+import sys
+import time
+import asyncio
+import uvicorn
+from fastapi import FastAPI, Request
+from rootpulse_core.search import MeilisearchService
+
+HOST, PORT = "127.0.0.1", 7799
+
+def build_stand_in(latency):
+    app = FastAPI()
+
+    @app.post("/indexes/{index_name}/search")
+    async def search(index_name: str, request: Request):
+        body = await request.json()
+        await asyncio.sleep(latency)
+        return {"hits": [{"id": 1, "name": body.get("q")}], "query": body.get("q"), "processingTimeMs": int(latency * 1000)}
+
+    @app.post("/indexes/{index_name}/documents")
+    async def add_documents(index_name: str):
+        return {"taskUid": 1, "status": "enqueued"}
+
+    @app.get("/tasks/{task_uid}")
+    async def get_task(task_uid: int):
+        return {"uid": task_uid, "status": "succeeded"}
+
+    return app
+
+async def run_benchmark(concurrency, latency):
+    server = uvicorn.Server(uvicorn.Config(build_stand_in(latency), host=HOST, port=PORT, log_level="warning"))
+    server_task = asyncio.create_task(server.serve())
+    while not server.started:
+        await asyncio.sleep(0.01)
+
+    service = MeilisearchService(url=f"http://{HOST}:{PORT}", api_key="bench")
+    await service.search("products", "warmup", use_cache=False)
+
+    started = time.perf_counter()
+    for i in range(concurrency):
+        await service.search("products", f"query {i}", use_cache=False)
+    sequential = time.perf_counter() - started
+
+    started = time.perf_counter()
+    await asyncio.gather(*(service.search("products", f"query {i}", use_cache=False) for i in range(concurrency)))
+    concurrent = time.perf_counter() - started
+
+    print(f"Searches: {concurrency}, stand-in latency: {latency * 1000:.0f}ms")
+    print(f"  Sequential: {sequential:.3f}s ({concurrency / sequential:.0f} req/s)")
+    print(f"  Concurrent: {concurrent:.3f}s ({concurrency / concurrent:.0f} req/s)")
+
+    await service.close()
+    server.should_exit = True
+    await server_task
+
+if __name__ == "__main__":
+    concurrency = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    latency_ms = float(sys.argv[2]) if len(sys.argv) > 2 else 20
+    asyncio.run(run_benchmark(concurrency, latency_ms / 1000))
@@ -0,0 +1,54 @@
+"""
+Benchmark StorageService uploads against a local MinIO stand-in.
+
+Start a throwaway MinIO first:
+    docker run --rm -p 9000:9000 minio/minio server /data
+
+    python bench_storage.py [size_mb] [concurrency]
+
+Compares the blocking single-PUT path with the streaming multipart path and checks
+that the uploaded object round-trips intact.
+"""
+import os
+import sys
+import time
+import asyncio
+import hashlib
+import tempfile
+from rootpulse_core.storage import StorageService
+
+async def run_benchmark(size_mb, concurrency):
+    service = StorageService(endpoint=os.getenv("S3_ENDPOINT", "http://localhost:9000"), bucket="bench")
+    try:
+        service.client.create_bucket(Bucket=service.bucket)
+    except service.client.exceptions.BucketAlreadyOwnedByYou:
+        pass
+
+    with tempfile.TemporaryFile() as source:
+        digest = hashlib.md5()
+        block = os.urandom(1024 * 1024)
+        for _ in range(size_mb):
+            source.write(block)
+            digest.update(block)
+
+        source.seek(0)
+        started = time.perf_counter()
+        service.upload_file(source, "bench/single-put.bin")
+        single = time.perf_counter() - started
+
+        source.seek(0)
+        result = await service.upload_stream(source, "bench/multipart.bin", concurrency=concurrency)
+
+    body = service.client.get_object(Bucket=service.bucket, Key="bench/multipart.bin")["Body"].read()
+    intact = hashlib.md5(body).hexdigest() == digest.hexdigest()
+
+    print(f"Object: {size_mb} MiB, part concurrency: {concurrency}")
+    print(f"  Single PUT: {single:.2f}s ({size_mb / single:.1f} MiB/s)")
+    print(f"  Multipart:  {result['duration']:.2f}s ({size_mb / result['duration']:.1f} MiB/s, {result['parts']} parts)")
+    print(f"  Round trip intact: {intact}")
+    service.close()
+
+if __name__ == "__main__":
+    size_mb = int(sys.argv[1]) if len(sys.argv) > 1 else 256
+    concurrency = int(sys.argv[2]) if len(sys.argv) > 2 else 8
+    asyncio.run(run_benchmark(size_mb, concurrency))
@@ -1,5 +1,6 @@
 from .bus.rabbitmq import bus as rabbitmq_bus
 from .observability.tracing import setup_tracing, get_tracer
+from .observability.metrics import setup_metrics, get_meter
 from .observability.resilience import circuit_breaker
 from .utils.currency import Currency, CurrencyConverter
 from .utils.translation import MultiLanguageMixin
@@ -0,0 +1,184 @@
+import math
+import time
+import uuid
+import heapq
+import asyncio
+import logging
+import itertools
+from contextlib import asynccontextmanager
+from typing import Optional
+from fastapi import HTTPException
+from .cache import cache
+from .observability.metrics import get_meter
+
+logger = logging.getLogger(__name__)
+meter = get_meter(__name__)
+
+admitted_counter = meter.create_counter("admission.admitted", description="Requests granted an execution slot")
+rejected_counter = meter.create_counter("admission.rejected", description="Requests shed because of queue time")
+queue_histogram = meter.create_histogram("admission.queue_time", unit="s", description="Time spent waiting for a slot")
+
+# Lower value = served first
+INTERACTIVE = 0
+BATCH = 10
+
+# Distributed semaphore: holders are members of a sorted set scored by lease expiry,
+# so slots held by crashed workers free themselves.
+ACQUIRE_SCRIPT = """
+local t = redis.call('TIME')
+local now = tonumber(t[1]) * 1000 + math.floor(tonumber(t[2]) / 1000)
+redis.call('ZREMRANGEBYSCORE', KEYS[1], '-inf', now)
+if redis.call('ZCARD', KEYS[1]) < tonumber(ARGV[1]) then
+    redis.call('ZADD', KEYS[1], now + tonumber(ARGV[2]), ARGV[3])
+    redis.call('PEXPIRE', KEYS[1], tonumber(ARGV[2]) * 2)
+    return 1
+end
+return 0
+"""
+
+class AdmissionRejected(HTTPException):
+    """
+    Raised when a request would queue longer than allowed. Surfaces as 503 + Retry-After.
+    """
+
+    def __init__(self, retry_after: float, detail: str = "Service is busy, please retry"):
+        self.retry_after = max(1, math.ceil(retry_after))
+        super().__init__(status_code=503, detail=detail, headers={"Retry-After": str(self.retry_after)})
+
+class AdmissionController:
+    """
+    Admission control for a scarce backend (e.g. the Ollama GPU).
+    - Bounded in-process concurrency with a priority queue (INTERACTIVE before BATCH)
+    - Optional Redis-coordinated global limit shared by every worker/pod; batch work
+      may only use `global_limit - interactive_reserve` of it
+    - Queue-time shedding: requests whose expected or actual wait exceeds `max_queue_time`
+      fail fast with AdmissionRejected instead of timing out upstream
+
+    Usage:
+        async with controller.slot(INTERACTIVE):
+            await call_backend()
+    """
+
+    def __init__(
+        self,
+        name: str,
+        local_limit: int = 4,
+        global_limit: int = 0,
+        interactive_reserve: int = 1,
+        max_queue_time: float = 10.0,
+        lease_time: float = 120.0,
+        redis=None,
+    ):
+        self.name = name
+        self.local_limit = local_limit
+        self.global_limit = global_limit
+        self.interactive_reserve = interactive_reserve
+        self.max_queue_time = max_queue_time
+        self.lease_time = lease_time
+        self.redis = redis or cache
+        self._active = 0
+        self._waiters = []
+        self._seq = itertools.count()
+        # Moving average of slot hold time, drives the expected-wait estimate
+        self._avg_service = None
+
+    # --- Local priority queue ---
+    def _estimated_wait(self, priority: int) -> float:
+        if self._avg_service is None:
+            return 0.0
+        ahead = sum(1 for p, _, fut in self._waiters if p <= priority and not fut.done())
+        return (ahead + 1) * self._avg_service / self.local_limit
+
+    def _wake(self):
+        while self._waiters and self._active < self.local_limit:
+            _, _, fut = heapq.heappop(self._waiters)
+            if fut.done():
+                continue
+            self._active += 1
+            fut.set_result(None)
+
+    def _release_local(self):
+        self._active -= 1
+        self._wake()
+
+    async def _acquire_local(self, priority: int, max_wait: float):
+        if self._active < self.local_limit and not self._waiters:
+            self._active += 1
+            return
+        estimate = self._estimated_wait(priority)
+        if estimate > max_wait:
+            raise AdmissionRejected(estimate)
+
+        fut = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (priority, next(self._seq), fut))
+        try:
+            await asyncio.wait_for(asyncio.shield(fut), timeout=max_wait)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            if fut.done() and not fut.cancelled():
+                # Granted just as we gave up; hand the slot on
+                self._release_local()
+            else:
+                fut.cancel()
+            if isinstance(e, asyncio.TimeoutError):
+                raise AdmissionRejected(self._estimated_wait(priority) or max_wait)
+            raise
+
+    # --- Global (Redis) semaphore ---
+    async def _acquire_global(self, priority: int, deadline: float) -> Optional[str]:
+        if not self.global_limit:
+            return None
+        limit = self.global_limit
+        if priority > INTERACTIVE:
+            limit = max(1, self.global_limit - self.interactive_reserve)
+        token = uuid.uuid4().hex
+        client = self.redis.get_client()
+        key = f"admission:{self.name}"
+        delay = 0.02
+        while True:
+            try:
+                if await client.eval(ACQUIRE_SCRIPT, 1, key, limit, int(self.lease_time * 1000), token):
+                    return token
+            except Exception as e:
+                logger.warning(f"Global admission unavailable for {self.name}, using local limit only: {str(e)}")
+                return None
+            if time.monotonic() + delay > deadline:
+                raise AdmissionRejected(self._avg_service or self.max_queue_time)
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, 0.25)
+
+    async def _release_global(self, token: Optional[str]):
+        if token is None:
+            return
+        try:
+            await self.redis.get_client().zrem(f"admission:{self.name}", token)
+        except Exception as e:
+            logger.warning(f"Failed to release global admission slot for {self.name}: {str(e)}")
+
+    @asynccontextmanager
+    async def slot(self, priority: int = INTERACTIVE, max_wait: Optional[float] = None):
+        max_wait = self.max_queue_time if max_wait is None else max_wait
+        attrs = {"backend": self.name, "priority": "interactive" if priority <= INTERACTIVE else "batch"}
+        started = time.monotonic()
+        try:
+            await self._acquire_local(priority, max_wait)
+        except AdmissionRejected:
+            rejected_counter.add(1, attrs)
+            raise
+        try:
+            token = await self._acquire_global(priority, started + max_wait)
+        except BaseException as e:
+            self._release_local()
+            if isinstance(e, AdmissionRejected):
+                rejected_counter.add(1, attrs)
+            raise
+
+        admitted_at = time.monotonic()
+        admitted_counter.add(1, attrs)
+        queue_histogram.record(admitted_at - started, attrs)
+        try:
+            yield
+        finally:
+            held = time.monotonic() - admitted_at
+            self._avg_service = held if self._avg_service is None else 0.9 * self._avg_service + 0.1 * held
+            self._release_local()
+            await self._release_global(token)
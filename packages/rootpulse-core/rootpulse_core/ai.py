@@ -1,10 +1,16 @@
 import os
+import uuid
+import time
 import logging
 import httpx
 import json
 import hashlib
-from typing import Optional, Dict, Any
-from .cache import cache
+from typing import Optional, Dict, Any, AsyncIterator
+from fastapi.responses import StreamingResponse
+from .cache import cache, SingleFlight
+from .streams import StreamWorker
+from .semantic_cache import SemanticCache
+from .admission import AdmissionController, AdmissionRejected, INTERACTIVE, BATCH
 
 logger = logging.getLogger(__name__)
 
@@ -15,6 +21,9 @@ class AIService:
     - Dedicated GPU execution
     - Redis-based response caching
     - On-demand and Batch inference via Redis Streams
+    - Pooled keep-alive HTTP client and de-duplication of identical in-flight prompts
+    - Optional semantic (embedding-similarity) cache for near-duplicate prompts
+    - GPU admission control: interactive requests jump batch work, overload fails fast with 503
     """
 
     def __init__(self, host=None, model="phi3"):
@@ -22,15 +31,66 @@ class AIService:
         self.model = model
         self.cache_enabled = os.getenv("AI_CACHE_ENABLED", "true").lower() == "true"
         self.cache_ttl = int(os.getenv("AI_CACHE_TTL", "86400"))  # 24 hours
+        self.timeout = float(os.getenv("AI_TIMEOUT", "60"))
+        self.max_connections = int(os.getenv("AI_MAX_CONNECTIONS", "20"))
+        self.batch_result_ttl = int(os.getenv("AI_BATCH_RESULT_TTL", "604800"))  # 7 days
+        self._client: Optional[httpx.AsyncClient] = None
+        self._inflight = SingleFlight()
 
-    def _generate_cache_key(self, prompt: str) -> str:
-        return f"ai_cache:{hashlib.md5(prompt.encode()).hexdigest()}"
+        self.admission = AdmissionController(
+            "ollama",
+            local_limit=int(os.getenv("AI_MAX_CONCURRENCY", "4")),
+            global_limit=int(os.getenv("AI_GLOBAL_CONCURRENCY", "0")),  # 0 = per-worker limit only
+            interactive_reserve=int(os.getenv("AI_INTERACTIVE_RESERVE", "1")),
+            max_queue_time=float(os.getenv("AI_MAX_QUEUE_TIME", "10")),
+            lease_time=self.timeout * 2,
+        )
+        self.batch_max_queue_time = float(os.getenv("AI_BATCH_MAX_QUEUE_TIME", "300"))
+
+        self.semantic_cache = None
+        if self.cache_enabled and os.getenv("AI_SEMANTIC_CACHE_ENABLED", "false").lower() == "true":
+            semantic_cache = SemanticCache(self)
+            if semantic_cache.available:
+                self.semantic_cache = semantic_cache
+            else:
+                logger.warning("AI_SEMANTIC_CACHE_ENABLED is set but numpy is not installed")
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        """
+        Long-lived pooled client (one per worker process). Closed via close().
+        """
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                base_url=self.host,
+                timeout=httpx.Timeout(self.timeout, connect=5.0),
+                limits=httpx.Limits(
+                    max_connections=self.max_connections,
+                    max_keepalive_connections=self.max_connections,
+                    keepalive_expiry=60.0,
+                ),
+            )
+        return self._client
+
+    async def close(self):
+        """
+        Shutdown hook, e.g. `app.add_event_handler("shutdown", ai_service.close)`.
+        """
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    def _generate_cache_key(self, prompt: str, system: Optional[str] = None, model: Optional[str] = None) -> str:
+        # Model and system prompt change the answer, so they are part of the key
+        raw = json.dumps([model or self.model, system or "", prompt])
+        return f"ai_cache:{hashlib.md5(raw.encode()).hexdigest()}"
 
     async def generate(self, prompt: str, system: Optional[str] = None) -> str:
         """
         On-demand inference with caching.
+        Identical concurrent prompts share a single Ollama call.
         """
-        cache_key = self._generate_cache_key(prompt)
+        cache_key = self._generate_cache_key(prompt, system)
         
         # 1. Check Cache
         if self.cache_enabled:
@@ -39,41 +99,245 @@ class AIService:
                 logger.info("Serving AI response from cache")
                 return cached_response
 
-        # 2. Call Ollama API
-        async with httpx.AsyncClient(timeout=60.0) as client:
-            payload = {
-                "model": self.model,
-                "prompt": prompt,
-                "stream": False
-            }
-            if system:
-                payload["system"] = system
+        # 2. Call Ollama API (once per distinct in-flight prompt)
+        return await self._inflight.do(cache_key, lambda: self._call_ollama(cache_key, prompt, system))
 
+    async def _call_ollama(self, cache_key: str, prompt: str, system: Optional[str]) -> str:
+        vector = None
+        if self.semantic_cache:
             try:
-                response = await client.post(f"{self.host}/api/generate", json=payload)
-                response.raise_for_status()
-                data = response.json()
-                ai_text = data.get("response", "")
+                answer, vector = await self.semantic_cache.lookup(prompt, system, self.model)
+                if answer:
+                    return answer
+            except Exception as e:
+                logger.warning(f"Semantic cache lookup failed: {str(e)}")
 
-                # 3. Cache the result
-                if self.cache_enabled and ai_text:
-                    await cache.set_value(cache_key, ai_text, ex=self.cache_ttl)
+        started = time.monotonic()
+        try:
+            ai_text = await self._complete(cache_key, prompt, system)
+        except AdmissionRejected:
+            raise
+        except Exception as e:
+            logger.error(f"Ollama API error: {str(e)}")
+            return "Error generating AI response."
 
-                return ai_text
+        if vector is not None and ai_text:
+            try:
+                await self.semantic_cache.add(vector, system, self.model, cache_key, time.monotonic() - started)
             except Exception as e:
-                logger.error(f"Ollama API error: {str(e)}")
-                return "Error generating AI response."
+                logger.warning(f"Semantic cache update failed: {str(e)}")
+        return ai_text
+
+    async def _complete(self, cache_key: str, prompt: str, system: Optional[str],
+                        priority: int = INTERACTIVE, max_wait: Optional[float] = None) -> str:
+        """
+        Non-streaming Ollama call that raises on failure and caches successful answers.
+        """
+        payload = {
+            "model": self.model,
+            "prompt": prompt,
+            "stream": False
+        }
+        if system:
+            payload["system"] = system
+
+        async with self.admission.slot(priority, max_wait):
+            response = await self.client.post("/api/generate", json=payload)
+        response.raise_for_status()
+        data = response.json()
+        ai_text = data.get("response", "")
+
+        # 3. Cache the result
+        if self.cache_enabled and ai_text:
+            await cache.set_value(cache_key, ai_text, ex=self.cache_ttl)
+
+        return ai_text
+
+    async def generate_stream(self, prompt: str, system: Optional[str] = None) -> AsyncIterator[str]:
+        """
+        Token streaming inference. Yields text fragments as Ollama produces them.
+        The assembled answer is cached once the stream completes; partial answers
+        (client disconnects, upstream errors) are never cached.
+        """
+        cache_key = self._generate_cache_key(prompt, system)
+
+        if self.cache_enabled:
+            cached_response = await cache.get_value(cache_key)
+            if cached_response:
+                logger.info("Serving AI response from cache")
+                yield cached_response
+                return
+
+        payload = {
+            "model": self.model,
+            "prompt": prompt,
+            "stream": True
+        }
+        if system:
+            payload["system"] = system
+
+        parts = []
+        completed = False
+        async with self.admission.slot(INTERACTIVE):
+            async with self.client.stream("POST", "/api/generate", json=payload) as response:
+                response.raise_for_status()
+                # Ollama streams NDJSON: one object per line, the last one has "done": true
+                async for line in response.aiter_lines():
+                    if not line:
+                        continue
+                    chunk = json.loads(line)
+                    if chunk.get("error"):
+                        raise RuntimeError(chunk["error"])
+                    token = chunk.get("response", "")
+                    if token:
+                        parts.append(token)
+                        yield token
+                    if chunk.get("done"):
+                        completed = True
+                        break
+
+        ai_text = "".join(parts)
+        if completed and self.cache_enabled and ai_text:
+            await cache.set_value(cache_key, ai_text, ex=self.cache_ttl)
 
-    async def enqueue_batch(self, stream_name: str, prompt: str, priority: int = 0):
+    async def sse_events(self, prompt: str, system: Optional[str] = None) -> AsyncIterator[str]:
+        """
+        Server-Sent Events framing around generate_stream().
+        """
+        try:
+            async for token in self.generate_stream(prompt, system):
+                yield f"data: {json.dumps({'token': token})}\n\n"
+            yield "event: done\ndata: {}\n\n"
+        except AdmissionRejected as e:
+            # Headers are already sent, so overload is reported in-band
+            yield f"event: error\ndata: {json.dumps({'message': e.detail, 'retry_after': e.retry_after})}\n\n"
+        except Exception as e:
+            logger.error(f"Ollama streaming error: {str(e)}")
+            yield f"event: error\ndata: {json.dumps({'message': 'Error generating AI response.'})}\n\n"
+
+    def streaming_response(self, prompt: str, system: Optional[str] = None) -> StreamingResponse:
+        """
+        Ready-to-return FastAPI response:
+            @router.post("/ask")
+            async def ask(body: Ask):
+                return ai_service.streaming_response(body.prompt)
+        """
+        return StreamingResponse(
+            self.sse_events(prompt, system),
+            media_type="text/event-stream",
+            headers={
+                "Cache-Control": "no-cache",
+                "X-Accel-Buffering": "no",  # Disable nginx proxy buffering
+            },
+        )
+
+    # --- Batch inference ---
+    @staticmethod
+    def batch_lanes(stream_name: str):
+        """
+        Priority lanes for a batch stream, highest first.
+        The hash tag keeps every lane in one cluster slot so they can be read together.
+        """
+        return [f"{{{stream_name}}}:high", f"{{{stream_name}}}:normal"]
+
+    @staticmethod
+    def _batch_key(request_id: str) -> str:
+        return f"ai_batch:{request_id}"
+
+    async def enqueue_batch(self, stream_name: str, prompt: str, priority: int = 0, system: Optional[str] = None):
         """
         Batch inference queueing using Redis Streams.
+        priority > 0 goes to the high lane. Returns a request id for get_batch_status().
         """
+        request_id = uuid.uuid4().hex
+        high, normal = self.batch_lanes(stream_name)
+        await cache.set_value(
+            self._batch_key(request_id),
+            {"status": "pending", "priority": priority, "enqueued_at": time.time()},
+            ex=self.batch_result_ttl,
+        )
         data = {
+            "request_id": request_id,
             "prompt": prompt,
             "priority": priority,
-            "status": "pending"
         }
-        return await cache.xadd(stream_name, data)
+        if system:
+            data["system"] = system
+        await cache.xadd(high if priority > 0 else normal, data)
+        return request_id
+
+    async def get_batch_status(self, request_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Status record: pending | processing | retrying | completed | failed,
+        plus `result` once completed or `error` on failure.
+        """
+        return await cache.get_value(self._batch_key(request_id))
+
+    async def get_batch_result(self, request_id: str) -> Optional[str]:
+        status = await self.get_batch_status(request_id)
+        if status and status.get("status") == "completed":
+            return status.get("result")
+        return None
+
+    async def _set_batch_status(self, request_id: str, **fields):
+        record = await self.get_batch_status(request_id) or {}
+        record.update(fields)
+        await cache.set_value(self._batch_key(request_id), record, ex=self.batch_result_ttl)
+
+    async def process_batch_entry(self, message_id: str, fields: Dict[str, str]):
+        """
+        StreamWorker handler for one queued prompt. Raises on failure so the entry is retried.
+        """
+        request_id = fields.get("request_id") or message_id
+        prompt = fields["prompt"]
+        system = fields.get("system") or None
+        await self._set_batch_status(request_id, status="processing", started_at=time.time())
+
+        cache_key = self._generate_cache_key(prompt, system)
+        ai_text = await cache.get_value(cache_key) if self.cache_enabled else None
+        try:
+            if not ai_text:
+                # Own flight key: on-demand calls swallow errors, batch calls must raise
+                ai_text = await self._inflight.do(
+                    f"batch:{cache_key}",
+                    lambda: self._complete(cache_key, prompt, system, BATCH, self.batch_max_queue_time),
+                )
+        except Exception as e:
+            await self._set_batch_status(request_id, status="retrying", error=str(e))
+            raise
+        await self._set_batch_status(request_id, status="completed", result=ai_text, completed_at=time.time())
 
 # Singleton instance
 ai_service = AIService()
+
+class AIBatchWorker(StreamWorker):
+    """
+    Drains AIService.enqueue_batch() lanes with a small, bounded number of concurrent
+    GPU requests so bulk jobs never starve on-demand traffic.
+
+    Usage (dedicated worker process):
+        worker = AIBatchWorker("ai_batch")
+        await worker.run()
+    """
+
+    def __init__(self, stream_name: str, group: str = "ai-batch", service: Optional[AIService] = None, **kwargs):
+        self.service = service or ai_service
+        kwargs.setdefault("concurrency", int(os.getenv("AI_BATCH_CONCURRENCY", "2")))
+        kwargs.setdefault("batch_size", kwargs["concurrency"])
+        # An entry is only abandoned once it could not still be waiting for a GPU slot
+        # (up to batch_max_queue_time) or running (up to timeout) on a live consumer
+        claim_margin = float(os.getenv("AI_BATCH_CLAIM_MARGIN", "30"))
+        kwargs.setdefault(
+            "claim_idle_ms", int((self.service.batch_max_queue_time + self.service.timeout + claim_margin) * 1000)
+        )
+        super().__init__(
+            AIService.batch_lanes(stream_name),
+            group,
+            self.service.process_batch_entry,
+            **kwargs,
+        )
+
+    async def dead_letter(self, stream, message_id, fields, deliveries):
+        await super().dead_letter(stream, message_id, fields, deliveries)
+        request_id = fields.get("request_id") or message_id
+        await self.service._set_batch_status(request_id, status="failed", failed_at=time.time())
@@ -0,0 +1,284 @@
+import os
+import time
+import asyncio
+import logging
+from datetime import datetime, timezone
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Sequence, Set, Tuple
+import aio_pika
+from opentelemetry.metrics import Observation
+from ..cache import cache
+from ..observability.metrics import get_meter
+from .rabbitmq import bus as rabbitmq_bus
+from .envelope import UnsupportedSchemaVersion
+
+logger = logging.getLogger(__name__)
+meter = get_meter(__name__)
+
+processed_counter = meter.create_counter("bus.consumer.processed", description="Events handled and acked")
+retried_counter = meter.create_counter("bus.consumer.retried", description="Events sent to a delay queue for retry")
+dead_letter_counter = meter.create_counter("bus.consumer.dead_lettered", description="Events moved to the dead-letter queue")
+duplicate_counter = meter.create_counter("bus.consumer.duplicates", description="Redeliveries of already processed events")
+handle_histogram = meter.create_histogram("bus.consumer.handle_time", unit="s", description="Handler execution time")
+lag_histogram = meter.create_histogram("bus.consumer.lag", unit="s", description="Publish to handler start latency")
+
+# Latest ready-message count per queue, exported through an observable gauge
+_queue_depth: Dict[str, int] = {}
+
+def _observe_depth(options):
+    return [Observation(depth, {"queue": queue}) for queue, depth in list(_queue_depth.items())]
+
+meter.create_observable_gauge("bus.consumer.queue_depth", callbacks=[_observe_depth], description="Messages waiting in the queue")
+
+Handler = Callable[[str, Dict[str, Any]], Awaitable[None]]
+
+RETRY_HEADER = "x-retry-count"
+ROUTING_KEY_HEADER = "x-original-routing-key"
+
+def _topic_matches(pattern: Tuple[str, ...], words: Tuple[str, ...]) -> bool:
+    """
+    AMQP topic semantics: `*` matches exactly one word, `#` zero or more.
+    """
+    if not pattern:
+        return not words
+    head, rest = pattern[0], pattern[1:]
+    if head == "#":
+        return any(_topic_matches(rest, words[i:]) for i in range(len(words) + 1))
+    return bool(words) and head in ("*", words[0]) and _topic_matches(rest, words[1:])
+
+class EventConsumer:
+    """
+    Consumer runtime for events published with RabbitMQBus.publish_event.
+    - Handlers registered per routing-key pattern (`user.*`, `order.#`), queue bound for each
+    - basic_qos prefetch plus bounded concurrent handlers
+    - Failed events are retried through per-attempt delay queues (TTL + dead-letter back
+      to the main queue) with exponential backoff, then land in `<queue>.dlq`
+    - Idempotency per (handler, message id) in Redis: a redelivery only runs the handlers
+      that have not succeeded for that event yet, and is acked and skipped once all have
+    - Queue depth gauge, delivery lag and handler time histograms
+    - Bodies decoded by content_type (JSON or msgpack, see bus.envelope); handlers may be
+      registered per schema_version, events no handler accepts go straight to the DLQ
+
+    Usage:
+        consumer = EventConsumer("notifications", exchange="iam")
+
+        @consumer.handler("user.registered")
+        async def send_welcome(routing_key, event): ...
+
+        @consumer.handler("order.placed", schema_version=2)
+        async def index_order(routing_key, event): ...
+
+        await consumer.run()
+    """
+
+    def __init__(
+        self,
+        queue: str,
+        exchange: str,
+        prefetch: Optional[int] = None,
+        concurrency: Optional[int] = None,
+        retry_delays: Sequence[float] = (1, 5, 30, 120),
+        idempotency_ttl: int = 7 * 24 * 3600,
+        stats_interval: float = 15,
+        bus=None,
+        redis=None,
+    ):
+        self.queue_name = queue
+        self.exchange_name = exchange
+        self.concurrency = concurrency or int(os.getenv("RABBITMQ_CONSUMER_CONCURRENCY", "16"))
+        self.prefetch = prefetch or int(os.getenv("RABBITMQ_PREFETCH", str(self.concurrency * 2)))
+        self.retry_delays = list(retry_delays)
+        self.idempotency_ttl = idempotency_ttl
+        self.stats_interval = stats_interval
+        self.bus = bus or rabbitmq_bus
+        self.redis = redis or cache
+        self.dead_letter_queue = f"{queue}.dlq"
+        self._handlers: List[Tuple[str, Any, Optional[int], Handler]] = []
+        self._tasks = set()
+        self._slots = None
+        self._channel = None
+        self._queue = None
+        self._stopping = asyncio.Event()
+
+    def handler(self, pattern: str, schema_version: Optional[int] = None):
+        """
+        Register a handler for a routing-key pattern; with `schema_version` it only
+        receives events of that version.
+        """
+        def decorator(fn: Handler):
+            self._handlers.append((pattern, tuple(pattern.split(".")), schema_version, fn))
+            return fn
+        return decorator
+
+    def _retry_queue(self, attempt: int) -> str:
+        return f"{self.queue_name}.retry.{attempt}"
+
+    # --- Topology ---
+    async def setup(self):
+        """
+        Declare queues and bindings. Declarations are idempotent, so every worker runs this.
+        """
+        connection = await self.bus.connect()
+        self._channel = await connection.channel()
+        await self._channel.set_qos(prefetch_count=self.prefetch)
+
+        exchange = await self._channel.declare_exchange(self.exchange_name, aio_pika.ExchangeType.TOPIC, durable=True)
+        dlx = await self._channel.declare_exchange(f"{self.queue_name}.dlx", aio_pika.ExchangeType.FANOUT, durable=True)
+        dlq = await self._channel.declare_queue(self.dead_letter_queue, durable=True)
+        await dlq.bind(dlx)
+
+        self._queue = await self._channel.declare_queue(
+            self.queue_name, durable=True, arguments={"x-dead-letter-exchange": dlx.name}
+        )
+        for pattern in dict.fromkeys(pattern for pattern, _, _, _ in self._handlers):
+            await self._queue.bind(exchange, routing_key=pattern)
+
+        for attempt, delay in enumerate(self.retry_delays, start=1):
+            # Expired messages fall back into the main queue through the default exchange
+            await self._channel.declare_queue(self._retry_queue(attempt), durable=True, arguments={
+                "x-message-ttl": int(delay * 1000),
+                "x-dead-letter-exchange": "",
+                "x-dead-letter-routing-key": self.queue_name,
+            })
+
+    # --- Main loop ---
+    async def run(self):
+        await self.setup()
+        self._slots = asyncio.Semaphore(self.concurrency)
+        tag = await self._queue.consume(self._on_message)
+        logger.info(f"EventConsumer consuming {self.queue_name} ({len(self._handlers)} handlers, prefetch {self.prefetch})")
+        try:
+            while not self._stopping.is_set():
+                await self.refresh_stats()
+                try:
+                    await asyncio.wait_for(self._stopping.wait(), timeout=self.stats_interval)
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            await self._queue.cancel(tag)
+            if self._tasks:
+                await asyncio.gather(*self._tasks, return_exceptions=True)
+            await self._channel.close()
+
+    def stop(self):
+        self._stopping.set()
+
+    async def _on_message(self, message: aio_pika.abc.AbstractIncomingMessage):
+        # Never block the delivery callback; prefetch already bounds how many are held
+        task = asyncio.ensure_future(self._handle(message))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    def _decode(self, message) -> Dict[str, Any]:
+        return self.bus.envelope.decode(message.body, message.content_type, message.content_encoding, message.message_id)
+
+    def _route(self, routing_key: str, schema_version: int) -> List[Tuple[str, Handler]]:
+        """
+        Returns (name, handler) pairs; the name keys per-handler idempotency.
+        """
+        words = tuple(routing_key.split("."))
+        matched = [(version, fn) for _, pattern, version, fn in self._handlers if _topic_matches(pattern, words)]
+        handlers = [fn for version, fn in matched if version is None or version == schema_version]
+        if matched and not handlers:
+            raise UnsupportedSchemaVersion(f"No handler for {routing_key} schema_version {schema_version}")
+        return list({f"{fn.__module__}.{fn.__qualname__}": fn for fn in handlers}.items())
+
+    async def _handle(self, message: aio_pika.abc.AbstractIncomingMessage):
+        headers = message.headers or {}
+        routing_key = headers.get(ROUTING_KEY_HEADER) or message.routing_key
+        attrs = {"queue": self.queue_name, "routing_key": routing_key}
+        async with self._slots:
+            if message.timestamp is not None:
+                sent = message.timestamp if message.timestamp.tzinfo else message.timestamp.replace(tzinfo=timezone.utc)
+                lag_histogram.record(max(0.0, (datetime.now(timezone.utc) - sent).total_seconds()), attrs)
+
+            try:
+                event = self._decode(message)
+                handlers = self._route(routing_key, event.get("schema_version", 1))
+            except Exception as e:
+                # Undecodable or unsupported version: retrying cannot help
+                logger.error(f"Rejecting {self.queue_name}/{routing_key} ({message.message_id}): {str(e)}")
+                await self._retry_or_dead_letter(message, routing_key, attrs, retry=False)
+                return
+
+            done_key = f"bus:handled:{self.queue_name}:{message.message_id}" if message.message_id else None
+            done = await self._handled(done_key) if done_key else set()
+            pending = [(name, fn) for name, fn in handlers if name not in done]
+            if handlers and not pending:
+                duplicate_counter.add(1, attrs)
+                await message.ack()
+                return
+
+            started = time.monotonic()
+            failed = False
+            try:
+                # Every pending handler gets its turn; a retry re-runs only the ones that failed
+                for name, fn in pending:
+                    try:
+                        await fn(routing_key, event)
+                    except Exception as e:
+                        failed = True
+                        logger.error(f"Handler {name} failed for {self.queue_name}/{routing_key} ({message.message_id}): {str(e)}")
+                        continue
+                    if done_key:
+                        await self._mark_handled(done_key, name)
+            finally:
+                handle_histogram.record(time.monotonic() - started, attrs)
+
+            if failed:
+                await self._retry_or_dead_letter(message, routing_key, attrs)
+                return
+            await message.ack()
+            processed_counter.add(1, attrs)
+
+    # --- Idempotency ---
+    async def _handled(self, key: str) -> Set[str]:
+        """
+        Names of the handlers that already succeeded for this event.
+        """
+        try:
+            return set(await self.redis.get_client().hkeys(key))
+        except Exception as e:
+            logger.warning(f"Idempotency check unavailable: {str(e)}")
+            return set()
+
+    async def _mark_handled(self, key: str, name: str):
+        try:
+            pipe = self.redis.get_client().pipeline(transaction=False)
+            pipe.hset(key, name, 1)
+            pipe.expire(key, self.idempotency_ttl)
+            await pipe.execute()
+        except Exception as e:
+            logger.warning(f"Failed to record handled event {key}/{name}: {str(e)}")
+
+    # --- Retries ---
+    async def _retry_or_dead_letter(self, message, routing_key, attrs, retry=True):
+        attempt = int((message.headers or {}).get(RETRY_HEADER, 0)) + 1
+        if not retry or attempt > len(self.retry_delays):
+            # Rejected without requeue -> main queue's dead-letter exchange -> <queue>.dlq
+            await message.reject(requeue=False)
+            dead_letter_counter.add(1, attrs)
+            logger.warning(f"Dead-lettered {self.queue_name}/{routing_key} ({message.message_id}) after {attempt - 1} retries")
+            return
+
+        headers = dict(message.headers or {})
+        headers.update({RETRY_HEADER: attempt, ROUTING_KEY_HEADER: routing_key})
+        retry = aio_pika.Message(
+            body=message.body,
+            headers=headers,
+            content_type=message.content_type,
+            content_encoding=message.content_encoding,
+            message_id=message.message_id,
+            timestamp=message.timestamp,
+            delivery_mode=aio_pika.DeliveryMode.PERSISTENT,
+        )
+        await self._channel.default_exchange.publish(retry, routing_key=self._retry_queue(attempt))
+        await message.ack()
+        retried_counter.add(1, attrs)
+
+    # --- Metrics ---
+    async def refresh_stats(self):
+        try:
+            declared = await self._channel.declare_queue(self.queue_name, passive=True)
+            _queue_depth[self.queue_name] = declared.declaration_result.message_count
+        except Exception as e:
+            logger.warning(f"Unable to read queue depth for {self.queue_name}: {str(e)}")
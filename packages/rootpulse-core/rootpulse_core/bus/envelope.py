@@ -0,0 +1,80 @@
+import os
+import time
+import uuid
+from typing import Any, Dict, Optional, Tuple
+from ..codec import Codec, COMPRESSIONS
+
+# AMQP content_type <-> codec serializer; content_encoding carries the compression
+CONTENT_TYPES = {"json": "application/json", "msgpack": "application/msgpack"}
+SERIALIZER_FOR_CONTENT_TYPE = {content_type: serializer for serializer, content_type in CONTENT_TYPES.items()}
+
+ENVELOPE_VERSION = 2
+
+class UnsupportedSchemaVersion(Exception):
+    """
+    No handler accepts this event's schema_version; retrying cannot help.
+    """
+
+class EventEnvelope:
+    """
+    Versioned event envelope shared by RabbitMQBus and EventConsumer.
+
+        {"v": 2, "id": "<uuid hex>", "event_type": "user.registered", "schema_version": 1,
+         "timestamp": <epoch ms>, "source": "iam", "data": {...}}
+
+    The body is JSON or msgpack (RABBITMQ_CODEC). Compression is opt-in: set
+    RABBITMQ_COMPRESSION=zstd|lz4 to compress bodies above RABBITMQ_COMPRESSION_THRESHOLD
+    bytes; by default every event is plain, uncompressed JSON. The format travels in
+    the AMQP content_type/content_encoding properties, so consumers decode whatever
+    they receive regardless of their own settings, and plain JSON stays readable by
+    anything. Version 1 envelopes (string schema_version and timestamp, no id) are
+    normalized on decode.
+    """
+
+    def __init__(self, codec: Optional[Codec] = None, source: Optional[str] = None):
+        self.codec = codec or Codec.from_env(prefix="RABBITMQ", compression="none")
+        self.source = source or os.getenv("SERVICE_NAME") or os.getenv("OTEL_SERVICE_NAME")
+
+    def build(self, event_type: str, data: Any, schema_version: int = 1, event_id: Optional[str] = None,
+              timestamp: Optional[float] = None) -> Dict[str, Any]:
+        envelope = {
+            "v": ENVELOPE_VERSION,
+            "id": event_id or uuid.uuid4().hex,
+            "event_type": event_type,
+            "schema_version": schema_version,
+            "timestamp": int((timestamp if timestamp is not None else time.time()) * 1000),
+            "data": data,
+        }
+        if self.source:
+            envelope["source"] = self.source
+        return envelope
+
+    def encode(self, envelope: Dict[str, Any], content_type: Optional[str] = None) -> Tuple[bytes, str, Optional[str]]:
+        """
+        Returns (body, content_type, content_encoding). `content_type` overrides the
+        configured serializer, e.g. "application/json" for external consumers.
+        """
+        codec = self.codec
+        if content_type and SERIALIZER_FOR_CONTENT_TYPE.get(content_type, codec.serializer) != codec.serializer:
+            codec = Codec(SERIALIZER_FOR_CONTENT_TYPE[content_type], codec.compression, codec.threshold, codec.level)
+        body, compression = codec.encode(envelope)
+        return body, CONTENT_TYPES[codec.serializer], None if compression == "none" else compression
+
+    def decode(self, body: bytes, content_type: Optional[str] = None, content_encoding: Optional[str] = None,
+               message_id: Optional[str] = None) -> Dict[str, Any]:
+        serializer = SERIALIZER_FOR_CONTENT_TYPE.get((content_type or "application/json").split(";")[0].strip())
+        if serializer is None:
+            raise ValueError(f"Unsupported event content type: {content_type}")
+        # Only our own compressions are undone; anything else (e.g. "utf-8" from other
+        # publishers) describes the text, not a transform, and is read as identity
+        compression = (content_encoding or "").strip().lower()
+        envelope = self.codec.decode(body, serializer, compression if compression in COMPRESSIONS else "none")
+        if envelope.get("v", 1) < ENVELOPE_VERSION:
+            # v1: {"event_type", "data", "schema_version": "1.0", "timestamp": ""}
+            envelope["id"] = envelope.get("id") or message_id
+            envelope["schema_version"] = int(float(envelope.get("schema_version") or 1))
+            envelope["timestamp"] = None
+        return envelope
+
+# Shared instance
+envelope = EventEnvelope()
@@ -1,71 +1,238 @@
-import pika
-import json
-import logging
 import os
+import asyncio
+import itertools
+import logging
+import aio_pika
+from datetime import datetime, timezone
+from aio_pika.pool import Pool
+from contextlib import asynccontextmanager
+from typing import Any, Iterable, List, Optional, Tuple
+from .envelope import EventEnvelope
 
 logger = logging.getLogger(__name__)
 
+class PublishBufferFull(Exception):
+    """
+    enqueue_event() was called with RABBITMQ_MAX_BUFFER events already waiting.
+    """
+
 class RabbitMQBus:
     """
     Standardizes RabbitMQ communication for all RootPulse services.
     Supports Publishing and Consuming with a unified event structure.
     Independent of Django settings.
+    asyncio-native (aio-pika): one robust connection per worker process that
+    reconnects by itself, and a pool of channels shared by concurrent publishers,
+    so publishing never blocks the event loop.
+    Publishing uses publisher confirms on a few shared channels: many messages are
+    in flight at once and each publish resolves when the broker acks it. Exchanges
+    are declared once per connection rather than per message.
     """
-    
+
     def __init__(self, host=None, port=None, user=None, password=None):
         self.host = host or os.getenv('RABBITMQ_HOST', 'localhost')
         self.port = int(port or os.getenv('RABBITMQ_PORT', 5672))
         self.user = user or os.getenv('RABBITMQ_USER', 'guest')
         self.password = password or os.getenv('RABBITMQ_PASS', 'guest')
+        self.channel_pool_size = int(os.getenv('RABBITMQ_CHANNEL_POOL_SIZE', 8))
+        self.heartbeat = int(os.getenv('RABBITMQ_HEARTBEAT', 60))
+        self.publish_channels = int(os.getenv('RABBITMQ_PUBLISH_CHANNELS', 2))
+        self.max_in_flight = int(os.getenv('RABBITMQ_MAX_IN_FLIGHT', 2000))
+        self.batch_size = int(os.getenv('RABBITMQ_BATCH_SIZE', 500))
+        self.flush_interval = float(os.getenv('RABBITMQ_FLUSH_INTERVAL', 0.005))
+        self.publish_timeout = float(os.getenv('RABBITMQ_PUBLISH_TIMEOUT', 10))
+        self.max_buffer = int(os.getenv('RABBITMQ_MAX_BUFFER', 10000))
         self._connection = None
-        self._channel = None
-
-    def connect(self):
-        if not self._connection or self._connection.is_closed:
-            credentials = pika.PlainCredentials(self.user, self.password)
-            parameters = pika.ConnectionParameters(
-                host=self.host,
-                port=self.port,
-                credentials=credentials,
-                heartbeat=600,
-                blocked_connection_timeout=300
-            )
-            self._connection = pika.BlockingConnection(parameters)
-            self._channel = self._connection.channel()
-        return self._channel
-
-    def publish_event(self, exchange, routing_key, event_type, data):
-        """
-        Publishes a JSON event to the specified exchange.
+        self._channel_pool = None
+        self._lock = None
+        self._publishers: List[aio_pika.abc.AbstractChannel] = []
+        self._next_publisher = itertools.count()
+        self._in_flight = None
+        self._declared = set()
+        self._buffer: List[Tuple[str, str, aio_pika.Message, asyncio.Future]] = []
+        self._flusher = None
+        self.envelope = EventEnvelope()
+
+    async def connect(self) -> aio_pika.RobustConnection:
+        if self._connection is None or self._connection.is_closed:
+            if self._lock is None:
+                self._lock = asyncio.Lock()
+            async with self._lock:
+                if self._connection is None or self._connection.is_closed:
+                    self._connection = await aio_pika.connect_robust(
+                        host=self.host,
+                        port=self.port,
+                        login=self.user,
+                        password=self.password,
+                        heartbeat=self.heartbeat,
+                        client_properties={"connection_name": f"rootpulse-{os.getpid()}"},
+                    )
+                    # A new broker connection may not know our exchanges (e.g. failover to a fresh node)
+                    self._connection.reconnect_callbacks.add(lambda *args: self._declared.clear())
+                    self._channel_pool = Pool(self._open_channel, max_size=self.channel_pool_size)
+                    self._publishers = [
+                        await self._connection.channel(publisher_confirms=True) for _ in range(self.publish_channels)
+                    ]
+                    self._in_flight = asyncio.Semaphore(self.max_in_flight)
+                    self._declared.clear()
+                    logger.info(f"Connected to RabbitMQ at {self.host}:{self.port}")
+        return self._connection
+
+    async def _open_channel(self) -> aio_pika.abc.AbstractChannel:
+        return await self._connection.channel()
+
+    @asynccontextmanager
+    async def channel(self):
+        """
+        Borrow a pooled channel: `async with bus.channel() as channel: ...`
+        """
+        await self.connect()
+        async with self._channel_pool.acquire() as channel:
+            if channel.is_closed:
+                # Channel-level errors (e.g. a bad declare) close the channel, not the connection
+                await channel.reopen()
+            yield channel
+
+    async def _publisher(self) -> aio_pika.abc.AbstractChannel:
+        """
+        Confirm-mode channels are shared, not borrowed: concurrent publishes pipeline on them.
+        """
+        await self.connect()
+        channel = self._publishers[next(self._next_publisher) % len(self._publishers)]
+        if channel.is_closed:
+            await channel.reopen()
+        return channel
+
+    async def _exchange(self, channel, exchange: str) -> aio_pika.abc.AbstractExchange:
+        if exchange not in self._declared:
+            async with self.channel() as declare_channel:
+                await declare_channel.declare_exchange(exchange, aio_pika.ExchangeType.TOPIC, durable=True)
+            self._declared.add(exchange)
+        return await channel.get_exchange(exchange, ensure=False)
+
+    def _message(self, event_type, data, message_id=None, timestamp=None, schema_version=1, content_type=None) -> aio_pika.Message:
+        timestamp = timestamp or datetime.now(timezone.utc)
+        event = self.envelope.build(event_type, data, schema_version, message_id, timestamp.timestamp())
+        body, content_type, content_encoding = self.envelope.encode(event, content_type)
+        return aio_pika.Message(
+            body=body,
+            content_type=content_type,
+            content_encoding=content_encoding,
+            type=event_type,
+            delivery_mode=aio_pika.DeliveryMode.PERSISTENT,  # make message persistent
+            message_id=event["id"],  # idempotency key for consumers
+            timestamp=timestamp,
+        )
+
+    async def _publish(self, exchange: str, routing_key: str, message: aio_pika.Message, timeout: Optional[float] = None):
+        """
+        Publish and wait for the broker's ack. Raises aio_pika.exceptions.DeliveryError on nack
+        and asyncio.TimeoutError if no confirm arrives within `timeout` (RABBITMQ_PUBLISH_TIMEOUT).
+        """
+        channel = await self._publisher()
+        target = await self._exchange(channel, exchange)
+        async with self._in_flight:
+            return await target.publish(message, routing_key=routing_key, timeout=timeout or self.publish_timeout)
+
+    async def publish_event(self, exchange, routing_key, event_type, data, message_id=None, timestamp=None,
+                            schema_version=1, content_type=None, timeout=None):
+        """
+        Publishes an event envelope (see bus.envelope) to the specified exchange.
+        Returns once the broker has confirmed it. Pass `message_id` to keep ids stable
+        across re-publishes (e.g. from the outbox); `content_type` overrides RABBITMQ_CODEC.
         """
         try:
-            channel = self.connect()
-            channel.exchange_declare(exchange=exchange, exchange_type='topic', durable=True)
-            
-            payload = {
-                "event_type": event_type,
-                "data": data,
-                "schema_version": "1.0",
-                "timestamp": str(os.getenv("TIMESTAMP", "")) # Just an example
-            }
-            
-            channel.basic_publish(
-                exchange=exchange,
-                routing_key=routing_key,
-                body=json.dumps(payload),
-                properties=pika.BasicProperties(
-                    delivery_mode=2,  # make message persistent
-                    content_type='application/json'
-                )
-            )
-            logger.info(f"Published event {event_type} to {exchange}/{routing_key}")
+            message = self._message(event_type, data, message_id, timestamp, schema_version, content_type)
+            await self._publish(exchange, routing_key, message, timeout)
+            logger.debug(f"Published event {event_type} to {exchange}/{routing_key}")
         except Exception as e:
             logger.error(f"Failed to publish event: {str(e)}")
             raise
 
-    def close(self):
-        if self._connection and self._connection.is_open:
-            self._connection.close()
+    async def publish_batch(self, exchange: str, events: Iterable[Tuple[str, str, Any]], content_type=None) -> List[Optional[Exception]]:
+        """
+        Publish many (routing_key, event_type, data) events with all of them in flight at
+        once, then wait for every confirm. Returns one entry per event: None if confirmed,
+        otherwise the exception.
+        """
+        results = await asyncio.gather(
+            *(
+                self._publish(exchange, routing_key, self._message(event_type, data, content_type=content_type))
+                for routing_key, event_type, data in events
+            ),
+            return_exceptions=True,
+        )
+        failures = [None if not isinstance(result, BaseException) else result for result in results]
+        failed = sum(1 for failure in failures if failure is not None)
+        if failed:
+            logger.error(f"{failed} of {len(failures)} events to {exchange} were not confirmed")
+        return failures
+
+    def enqueue_event(self, exchange, routing_key, event_type, data, schema_version=1, content_type=None) -> asyncio.Future:
+        """
+        Buffer an event for the background flusher and return immediately. Buffers are sent
+        every RABBITMQ_FLUSH_INTERVAL seconds or once RABBITMQ_BATCH_SIZE events are queued.
+        The returned future resolves when the broker confirms the event; awaiting it is optional.
+        Raises PublishBufferFull once RABBITMQ_MAX_BUFFER events are waiting, e.g. while the
+        broker is unreachable, instead of growing without bound.
+        """
+        if len(self._buffer) >= self.max_buffer:
+            raise PublishBufferFull(f"{len(self._buffer)} events already buffered for publishing")
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        message = self._message(event_type, data, schema_version=schema_version, content_type=content_type)
+        self._buffer.append((exchange, routing_key, message, future))
+        if self._flusher is None or self._flusher.done():
+            self._flusher = asyncio.ensure_future(self._flush_loop())
+        return future
+
+    async def _flush_loop(self):
+        while self._buffer:
+            if len(self._buffer) < self.batch_size:
+                await asyncio.sleep(self.flush_interval)
+            await self.flush()
+
+    async def flush(self):
+        """
+        Send everything buffered by enqueue_event() and wait for the confirms.
+        """
+        batch, self._buffer = self._buffer, []
+        if not batch:
+            return
+        results = await asyncio.gather(
+            *(self._publish(exchange, routing_key, message) for exchange, routing_key, message, _ in batch),
+            return_exceptions=True,
+        )
+        for (_, _, _, future), result in zip(batch, results):
+            if future.done():
+                continue
+            if isinstance(result, BaseException):
+                future.set_exception(result)
+                # Nobody may await it; keep the failure visible without "exception never retrieved"
+                future.exception()
+                logger.error(f"Failed to publish buffered event: {str(result)}")
+            else:
+                future.set_result(result)
+
+    async def close(self):
+        """
+        Shutdown hook, e.g. `app.add_event_handler("shutdown", rabbitmq_bus.close)`.
+        Flushes buffered events first.
+        """
+        if self._flusher is not None:
+            await self._flusher
+            self._flusher = None
+        await self.flush()
+        for channel in self._publishers:
+            if not channel.is_closed:
+                await channel.close()
+        self._publishers = []
+        if self._channel_pool is not None:
+            await self._channel_pool.close()
+            self._channel_pool = None
+        if self._connection is not None and not self._connection.is_closed:
+            await self._connection.close()
+        self._connection = None
 
 # Singleton instance
 bus = RabbitMQBus()
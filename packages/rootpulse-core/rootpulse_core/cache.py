@@ -1,34 +1,307 @@
 import os
+import time
+import uuid
+import asyncio
+import hashlib
+import inspect
 import logging
-from redis.cluster import RedisCluster
-from redis.asyncio import Redis
+import functools
+from collections import OrderedDict
+from redis.asyncio import Redis, BlockingConnectionPool
+from redis.asyncio.cluster import RedisCluster
+from redis.asyncio.retry import Retry
+from redis.backoff import ExponentialBackoff
+from redis.exceptions import ConnectionError as RedisConnectionError, TimeoutError as RedisTimeoutError
+from redis.crc import key_slot
 import json
+from .codec import Codec
+from .observability.metrics import get_meter
 
 logger = logging.getLogger(__name__)
+meter = get_meter(__name__)
+
+pool_wait_counter = meter.create_counter(
+    "redis.pool.exhausted", description="Connection checkouts that had to wait for a free connection"
+)
+pool_timeout_counter = meter.create_counter(
+    "redis.pool.timeouts", description="Connection checkouts that gave up waiting"
+)
+pool_wait_histogram = meter.create_histogram(
+    "redis.pool.wait_time", unit="s", description="Time spent waiting for a pooled connection"
+)
+
+_MISSING = object()
+
+# Compare-and-delete so a lock is only released by the holder that set it
+_RELEASE_LOCK_SCRIPT = """
+if redis.call("get", KEYS[1]) == ARGV[1] then
+    return redis.call("del", KEYS[1])
+end
+return 0
+"""
+
+# Compare-and-pexpire: only the holder can keep its lock alive
+_EXTEND_LOCK_SCRIPT = """
+if redis.call("get", KEYS[1]) == ARGV[1] then
+    return redis.call("pexpire", KEYS[1], ARGV[2])
+end
+return 0
+"""
+
+class LocalCache:
+    """
+    Size-bounded in-process LRU with per-entry TTL.
+    Used as the L1 tier in front of Redis for read-heavy keys.
+    """
+
+    def __init__(self, maxsize=1024, ttl=30):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, default=_MISSING):
+        entry = self._data.get(key)
+        if entry is None:
+            self.misses += 1
+            return default
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            del self._data[key]
+            self.misses += 1
+            return default
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key, value, ttl=None):
+        ttl = self.ttl if ttl is None else min(ttl, self.ttl)
+        self._data[key] = (time.monotonic() + ttl, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def delete(self, key):
+        self._data.pop(key, None)
+
+    def clear(self):
+        self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+class SingleFlight:
+    """
+    Collapses concurrent calls for the same key into one in-flight task.
+    Followers await the leader's result; cancelling a caller never cancels the shared work.
+    """
+
+    def __init__(self):
+        self._inflight = {}
+
+    async def do(self, key, fn):
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(fn())
+            self._inflight[key] = task
+            task.add_done_callback(functools.partial(self._forget, key))
+        return await asyncio.shield(task)
+
+    def _forget(self, key, task):
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        if not task.cancelled():
+            task.exception()  # Mark retrieved; callers already received it
+
+    def __contains__(self, key):
+        return key in self._inflight
+
+class InstrumentedConnectionPool(BlockingConnectionPool):
+    """
+    Blocking pool that waits (up to `timeout`) instead of failing when all connections
+    are checked out, and reports how often and how long that happens.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.exhausted = 0
+        self.timeouts = 0
+
+    async def get_connection(self, command_name, *keys, **options):
+        in_use = len(getattr(self, "_in_use_connections", ()))
+        if in_use < self.max_connections:
+            return await super().get_connection(command_name, *keys, **options)
+
+        self.exhausted += 1
+        pool_wait_counter.add(1)
+        started = time.monotonic()
+        try:
+            return await super().get_connection(command_name, *keys, **options)
+        except (RedisConnectionError, asyncio.TimeoutError):
+            self.timeouts += 1
+            pool_timeout_counter.add(1)
+            logger.warning(f"Redis pool exhausted: no connection within {self.timeout}s")
+            raise
+        finally:
+            pool_wait_histogram.record(time.monotonic() - started)
 
 class RedisCache:
     """
     Standardized Redis integration for RootPulse.
     Supports Cluster mode for HA and horizontal scaling.
     Includes helpers for Streams (Producer/Consumer).
+    Optional in-process L1 tier kept coherent across workers via Pub/Sub.
+    Cached values are stored through a binary Codec (orjson/msgpack + zstd/lz4).
     """
 
-    def __init__(self, host=None, port=None):
+    def __init__(self, host=None, port=None, l1_enabled=None, l1_maxsize=None, l1_ttl=None, codec=None):
         self.host = host or os.getenv("REDIS_HOST", "localhost")
         self.port = int(port or os.getenv("REDIS_PORT", "6379"))
         self.use_cluster = os.getenv("REDIS_CLUSTER_ENABLED", "false").lower() == "true"
+        self.codec = codec or Codec.from_env()
         self._client = None
+        self._binary_client = None
+        self._pubsub_client = None
+
+        # --- Connection pool (per worker process, per client) ---
+        self.max_connections = int(os.getenv("REDIS_MAX_CONNECTIONS", "50"))
+        self.pool_timeout = float(os.getenv("REDIS_POOL_TIMEOUT", "5"))
+        self.health_check_interval = int(os.getenv("REDIS_HEALTH_CHECK_INTERVAL", "30"))
+        self.socket_timeout = float(os.getenv("REDIS_SOCKET_TIMEOUT", "5"))
+        self.retry_attempts = int(os.getenv("REDIS_RETRY_ATTEMPTS", "3"))
+
+        # --- L1 (in-process) tier ---
+        if l1_enabled is None:
+            l1_enabled = os.getenv("REDIS_L1_ENABLED", "false").lower() == "true"
+        self.l1 = None
+        if l1_enabled:
+            self.l1 = LocalCache(
+                maxsize=int(l1_maxsize or os.getenv("REDIS_L1_MAX_SIZE", "1024")),
+                ttl=float(l1_ttl or os.getenv("REDIS_L1_TTL", "30")),
+            )
+        # Comma separated key prefixes eligible for L1 (empty = every key)
+        prefixes = os.getenv("REDIS_L1_PREFIXES", "")
+        self.l1_prefixes = tuple(p.strip() for p in prefixes.split(",") if p.strip())
+        self.l1_channel = os.getenv("REDIS_L1_CHANNEL", "rootpulse:cache:invalidate")
+        # Invalidation sequence numbers, so a read racing an invalidation never repopulates L1
+        self._l1_seq = 0
+        self._l1_floor = 0
+        self._l1_invalidated = OrderedDict()
+        self._instance_id = uuid.uuid4().hex
+        self._listener_task = None
+
+    def _build_client(self, decode_responses):
+        retry = Retry(ExponentialBackoff(cap=1, base=0.05), self.retry_attempts)
+        if self.use_cluster:
+            # The async cluster client follows MOVED/ASK redirects itself and refreshes
+            # its slot map; cluster_error_retry_attempts bounds retries on topology changes.
+            client = RedisCluster(
+                host=self.host,
+                port=self.port,
+                decode_responses=decode_responses,
+                max_connections=self.max_connections,
+                health_check_interval=self.health_check_interval,
+                socket_timeout=self.socket_timeout,
+                retry=retry,
+                cluster_error_retry_attempts=self.retry_attempts,
+            )
+            logger.info(f"Connected to Redis Cluster at {self.host}:{self.port}")
+        else:
+            pool = InstrumentedConnectionPool(
+                host=self.host,
+                port=self.port,
+                decode_responses=decode_responses,
+                max_connections=self.max_connections,
+                timeout=self.pool_timeout,
+                health_check_interval=self.health_check_interval,
+                socket_timeout=self.socket_timeout,
+                retry=retry,
+                retry_on_error=[RedisConnectionError, RedisTimeoutError],
+            )
+            client = Redis(connection_pool=pool)
+            logger.info(f"Connected to standalone Redis at {self.host}:{self.port}")
+        return client
 
     def get_client(self):
+        """
+        Text client (decode_responses=True) for streams, locks, pub/sub and raw commands.
+        """
         if self._client is None:
+            self._client = self._build_client(decode_responses=True)
+        return self._client
+
+    def get_binary_client(self):
+        """
+        Bytes client used for codec-encoded cache values.
+        """
+        if self._binary_client is None:
+            self._binary_client = self._build_client(decode_responses=False)
+        return self._binary_client
+
+    def get_pubsub_client(self):
+        """
+        Client for SUBSCRIBE. Cluster PUBLISH is broadcast to every node, so in cluster
+        mode a plain connection to the seed node receives all messages.
+        """
+        if not self.use_cluster:
+            return self.get_client()
+        if self._pubsub_client is None:
+            self._pubsub_client = Redis(
+                host=self.host,
+                port=self.port,
+                decode_responses=True,
+                health_check_interval=self.health_check_interval,
+            )
+        return self._pubsub_client
+
+    def pool_stats(self):
+        """
+        Snapshot of pool usage for health endpoints.
+        """
+        stats = {}
+        for name, client in (("text", self._client), ("binary", self._binary_client)):
+            if client is None:
+                continue
             if self.use_cluster:
-                startup_nodes = [{"host": self.host, "port": self.port}]
-                self._client = RedisCluster(startup_nodes=startup_nodes, decode_responses=True)
-                logger.info(f"Connected to Redis Cluster at {self.host}:{self.port}")
+                nodes = client.get_nodes()
+                stats[name] = {
+                    f"{node.host}:{node.port}": {
+                        "connections": len(getattr(node, "_connections", ())),
+                        "free": len(getattr(node, "_free", ())),
+                        "max": node.max_connections,
+                    }
+                    for node in nodes
+                }
             else:
-                self._client = Redis(host=self.host, port=self.port, decode_responses=True)
-                logger.info(f"Connected to standalone Redis at {self.host}:{self.port}")
-        return self._client
+                pool = client.connection_pool
+                stats[name] = {
+                    "in_use": len(getattr(pool, "_in_use_connections", ())),
+                    "max": pool.max_connections,
+                    "exhausted": pool.exhausted,
+                    "timeouts": pool.timeouts,
+                }
+        return stats
+
+    async def ping(self):
+        """
+        Health check used by service readiness probes.
+        """
+        try:
+            return bool(await self.get_client().ping())
+        except Exception as e:
+            logger.error(f"Redis health check failed: {str(e)}")
+            return False
+
+    async def close(self):
+        """
+        Release pooled connections. Call from the FastAPI shutdown hook.
+        """
+        await self.stop_listener()
+        for client in (self._client, self._binary_client, self._pubsub_client):
+            if client is not None:
+                await client.aclose() if hasattr(client, "aclose") else await client.close()
+        self._client = self._binary_client = self._pubsub_client = None
 
     # --- Streams Support (Producer) ---
     async def xadd(self, stream_name, data, maxlen=10000):
@@ -53,15 +326,384 @@ class RedisCache:
             logger.error(f"Error reading from stream group: {str(e)}")
             return None
 
+    # --- L1 Invalidation (Pub/Sub) ---
+    def _l1_eligible(self, key):
+        if self.l1 is None:
+            return False
+        return not self.l1_prefixes or key.startswith(self.l1_prefixes)
+
+    def _l1_invalidate(self, key=None):
+        """
+        Drop one key (or everything) from L1 and record when, see _l1_fill.
+        """
+        self._l1_seq += 1
+        if key is None:
+            self._l1_floor = self._l1_seq
+            self.l1.clear()
+            return
+        self.l1.delete(key)
+        self._l1_invalidated[key] = self._l1_seq
+        self._l1_invalidated.move_to_end(key)
+        while len(self._l1_invalidated) > 4096:
+            # Forgotten entries raise the floor: reads older than it never populate
+            _, seq = self._l1_invalidated.popitem(last=False)
+            self._l1_floor = max(self._l1_floor, seq)
+
+    def _l1_fill(self, key, raw, pttl, started):
+        """
+        Populate L1 with the encoded value read from Redis, unless the key was invalidated
+        since the read started. The L1 TTL never outlives the Redis key (PTTL).
+        """
+        if started < max(self._l1_floor, self._l1_invalidated.get(key, 0)):
+            return
+        if pttl is not None and pttl != -1:
+            if pttl <= 0:
+                return
+            self.l1.set(key, raw, ttl=pttl / 1000)
+            return
+        self.l1.set(key, raw)
+
+    def _ensure_listener(self):
+        if self._listener_task is None or self._listener_task.done():
+            try:
+                loop = asyncio.get_running_loop()
+            except RuntimeError:
+                return
+            self._listener_task = loop.create_task(self._listen_invalidations())
+
+    async def _listen_invalidations(self):
+        """
+        Drop L1 entries invalidated by other workers/pods.
+        On any disconnect the whole L1 is flushed since messages may have been missed.
+        """
+        backoff = 0.5
+        while True:
+            pubsub = self.get_pubsub_client().pubsub()
+            try:
+                await pubsub.subscribe(self.l1_channel)
+                backoff = 0.5
+                async for message in pubsub.listen():
+                    if message.get("type") != "message":
+                        continue
+                    origin, _, payload = message["data"].partition(":")
+                    if origin == self._instance_id:
+                        continue
+                    if payload == "*":
+                        self._l1_invalidate()
+                        continue
+                    for key in payload.split("\n"):
+                        self._l1_invalidate(key)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"L1 invalidation listener error: {str(e)}")
+            finally:
+                self._l1_invalidate()
+                try:
+                    await pubsub.unsubscribe(self.l1_channel)
+                    await pubsub.close()
+                except Exception:
+                    pass
+            await asyncio.sleep(backoff)
+            backoff = min(backoff * 2, 30)
+
+    async def _publish_invalidation(self, *keys):
+        # One message for the whole batch (newline separated): PUBLISH is blocked inside cluster pipelines
+        payload = "\n".join(keys)
+        await self.get_client().publish(self.l1_channel, f"{self._instance_id}:{payload}")
+
+    async def stop_listener(self):
+        if self._listener_task is not None:
+            self._listener_task.cancel()
+            try:
+                await self._listener_task
+            except asyncio.CancelledError:
+                pass
+            self._listener_task = None
+
     # --- Session & Cache Helpers ---
+    # L1 holds the encoded bytes, so callers always get a fresh object they may mutate
     async def set_value(self, key, value, ex=None):
-        client = self.get_client()
-        return await client.set(key, json.dumps(value), ex=ex)
+        client = self.get_binary_client()
+        raw = self.codec.dumps(value)
+        result = await client.set(key, raw, ex=ex)
+        if self._l1_eligible(key):
+            self._ensure_listener()
+            self._l1_invalidate(key)
+            self.l1.set(key, raw, ttl=ex)
+            await self._publish_invalidation(key)
+        return result
 
     async def get_value(self, key):
+        client = self.get_binary_client()
+        if not self._l1_eligible(key):
+            val = await client.get(key)
+            return self.codec.loads(val) if val else None
+
+        self._ensure_listener()
+        raw = self.l1.get(key)
+        if raw is not _MISSING:
+            return self.codec.loads(raw)
+        started = self._l1_seq
+        pipe = client.pipeline(transaction=False)
+        pipe.get(key)
+        pipe.pttl(key)
+        val, pttl = await pipe.execute()
+        if not val:
+            return None
+        self._l1_fill(key, val, pttl, started)
+        return self.codec.loads(val)
+
+    async def delete_value(self, key):
+        client = self.get_client()
+        result = await client.delete(key)
+        if self._l1_eligible(key):
+            self._l1_invalidate(key)
+            await self._publish_invalidation(key)
+        return result
+
+    # --- Distributed Locks ---
+    async def acquire_lock(self, name, timeout=10):
+        """
+        Try to take a short-lived lock. Returns a token on success, None if held elsewhere.
+        """
+        token = uuid.uuid4().hex
         client = self.get_client()
-        val = await client.get(key)
-        return json.loads(val) if val else None
+        if await client.set(f"lock:{name}", token, nx=True, px=int(timeout * 1000)):
+            return token
+        return None
+
+    async def extend_lock(self, name, token, timeout=10):
+        """
+        Reset a held lock's expiry to `timeout` seconds. Returns False if it expired or was taken over.
+        """
+        client = self.get_client()
+        return bool(await client.eval(_EXTEND_LOCK_SCRIPT, 1, f"lock:{name}", token, int(timeout * 1000)))
+
+    async def release_lock(self, name, token):
+        client = self.get_client()
+        return await client.eval(_RELEASE_LOCK_SCRIPT, 1, f"lock:{name}", token)
+
+    # --- Bulk Helpers (pipelined) ---
+    def _slot_groups(self, keys):
+        """
+        Group keys by cluster hash slot so multi-key commands never hit CROSSSLOT.
+        Standalone Redis has a single group.
+        """
+        if not self.use_cluster:
+            return [list(keys)]
+        groups = {}
+        for key in keys:
+            groups.setdefault(key_slot(key.encode()), []).append(key)
+        return list(groups.values())
+
+    async def get_many(self, keys):
+        """
+        Fetch many keys in one round trip (MGET; in cluster mode one MGET per hash slot, sent concurrently).
+        Returns a dict of key -> value for keys that exist.
+        """
+        keys = list(dict.fromkeys(keys))
+        result = {}
+        pending = []
+        for key in keys:
+            if self._l1_eligible(key):
+                raw = self.l1.get(key)
+                if raw is not _MISSING:
+                    result[key] = self.codec.loads(raw)
+                    continue
+            pending.append(key)
+        if not pending:
+            return result
+
+        client = self.get_binary_client()
+        started = self._l1_seq
+        if self.use_cluster:
+            # MGET cannot be pipelined in cluster mode; mget_nonatomic splits by slot itself
+            values = await client.mget_nonatomic(pending)
+        else:
+            values = await client.mget(pending)
+
+        fill = {}
+        for key, val in zip(pending, values):
+            if not val:
+                continue
+            result[key] = self.codec.loads(val)
+            if self._l1_eligible(key):
+                fill[key] = val
+        if fill:
+            self._ensure_listener()
+            # Single-key PTTLs are fine in a cluster pipeline (routed per node)
+            pipe = client.pipeline(transaction=False)
+            for key in fill:
+                pipe.pttl(key)
+            for (key, val), pttl in zip(fill.items(), await pipe.execute()):
+                self._l1_fill(key, val, pttl, started)
+        return result
+
+    async def set_many(self, mapping, ex=None):
+        """
+        Store many values in one pipelined round trip.
+        `ex` is either a single TTL for every key or a dict of per-key TTLs.
+        """
+        if not mapping:
+            return
+        client = self.get_binary_client()
+        encoded = {key: self.codec.dumps(value) for key, value in mapping.items()}
+        pipe = client.pipeline(transaction=False)
+        for key, raw in encoded.items():
+            ttl = ex.get(key) if isinstance(ex, dict) else ex
+            pipe.set(key, raw, ex=ttl)
+        await pipe.execute()
+
+        l1_keys = [key for key in mapping if self._l1_eligible(key)]
+        if l1_keys:
+            self._ensure_listener()
+            for key in l1_keys:
+                ttl = ex.get(key) if isinstance(ex, dict) else ex
+                self._l1_invalidate(key)
+                self.l1.set(key, encoded[key], ttl=ttl)
+            await self._publish_invalidation(*l1_keys)
+
+    async def delete_many(self, keys):
+        """
+        Delete many keys, one DEL per hash slot. Returns the number of keys removed.
+        """
+        keys = list(dict.fromkeys(keys))
+        if not keys:
+            return 0
+        client = self.get_client()
+        groups = self._slot_groups(keys)
+        if len(groups) == 1:
+            deleted = await client.delete(*groups[0])
+        else:
+            pipe = client.pipeline(transaction=False)
+            for group in groups:
+                pipe.delete(*group)
+            deleted = sum(await pipe.execute())
+
+        l1_keys = [key for key in keys if self._l1_eligible(key)]
+        if l1_keys:
+            for key in l1_keys:
+                self._l1_invalidate(key)
+            await self._publish_invalidation(*l1_keys)
+        return deleted
 
 # Singleton instance
 cache = RedisCache()
+
+def _default_key(args, kwargs):
+    raw = json.dumps([args, kwargs], sort_keys=True, default=str)
+    return hashlib.md5(raw.encode()).hexdigest()
+
+def cached(ttl=300, stale_ttl=0, key=None, prefix=None, lock_timeout=10, backend=None):
+    """
+    Stampede-proof caching decorator for async functions.
+
+    - Concurrent misses in one process share a single computation (SingleFlight).
+    - Across pods a short Redis lock elects one computer; the others poll for its result
+      and only compute themselves if the lock holder does not finish within `lock_timeout`.
+    - With `stale_ttl` > 0 an expired entry is served for that many extra seconds while a
+      background refresh runs (stale-while-revalidate).
+
+    `key` is an optional callable receiving the call arguments and returning the key suffix.
+    By default the arguments are hashed, skipping `self`/`cls` for methods.
+
+    Usage:
+        @cached(ttl=600, stale_ttl=60)
+        async def get_product(product_id: str): ...
+    """
+    def decorator(func):
+        name = prefix or f"cached:{func.__module__}.{func.__qualname__}"
+        params = list(inspect.signature(func).parameters)
+        skip_first = bool(params) and params[0] in ("self", "cls")
+        flight = SingleFlight()
+        background = set()
+
+        def build_key(args, kwargs):
+            if key is not None:
+                return f"{name}:{key(*args, **kwargs)}"
+            return f"{name}:{_default_key(args[1:] if skip_first else args, kwargs)}"
+
+        async def store_result(store, cache_key, value):
+            entry = {"v": value, "f": time.time() + ttl}
+            try:
+                await store.set_value(cache_key, entry, ex=int(ttl + stale_ttl))
+            except Exception as e:
+                logger.warning(f"cached: failed to store {cache_key}: {str(e)}")
+
+        async def compute(store, cache_key, args, kwargs, wait):
+            try:
+                token = await store.acquire_lock(cache_key, timeout=lock_timeout)
+                locked_elsewhere = token is None
+            except Exception as e:
+                logger.warning(f"cached: lock unavailable for {cache_key}: {str(e)}")
+                token, locked_elsewhere = None, False
+
+            if locked_elsewhere:
+                if not wait:
+                    # Another pod is already refreshing this entry
+                    return None
+                # Another pod is computing; poll for its result before giving up
+                deadline = time.monotonic() + lock_timeout
+                delay = 0.02
+                while time.monotonic() < deadline:
+                    await asyncio.sleep(delay)
+                    delay = min(delay * 2, 0.25)
+                    entry = await store.get_value(cache_key)
+                    if entry is not None and entry["f"] > time.time():
+                        return entry["v"]
+
+            try:
+                value = await func(*args, **kwargs)
+                await store_result(store, cache_key, value)
+                return value
+            finally:
+                if token is not None:
+                    try:
+                        await store.release_lock(cache_key, token)
+                    except Exception:
+                        pass
+
+        def log_refresh_failure(task):
+            background.discard(task)
+            if not task.cancelled() and task.exception() is not None:
+                logger.warning(f"cached: background refresh failed: {str(task.exception())}")
+
+        def refresh_in_background(store, cache_key, args, kwargs):
+            # Separate flight key so foreground misses never join a no-wait refresh
+            refresh_key = f"{cache_key}:refresh"
+            if refresh_key in flight:
+                return
+            task = asyncio.ensure_future(
+                flight.do(refresh_key, lambda: compute(store, cache_key, args, kwargs, wait=False))
+            )
+            background.add(task)
+            task.add_done_callback(log_refresh_failure)
+
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            store = backend or cache
+            cache_key = build_key(args, kwargs)
+            try:
+                entry = await store.get_value(cache_key)
+            except Exception as e:
+                logger.warning(f"cached: cache read failed for {cache_key}: {str(e)}")
+                return await func(*args, **kwargs)
+
+            if entry is not None:
+                if entry["f"] > time.time():
+                    return entry["v"]
+                if stale_ttl:
+                    refresh_in_background(store, cache_key, args, kwargs)
+                    return entry["v"]
+
+            return await flight.do(cache_key, lambda: compute(store, cache_key, args, kwargs, wait=True))
+
+        async def invalidate(*args, **kwargs):
+            store = backend or cache
+            return await store.delete_value(build_key(args, kwargs))
+
+        wrapper.invalidate = invalidate
+        wrapper.cache_key = lambda *args, **kwargs: build_key(args, kwargs)
+        return wrapper
+    return decorator
@@ -0,0 +1,164 @@
+import os
+import json
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Optional fast paths; everything degrades to stdlib json / no compression
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+try:
+    import lz4.frame as lz4_frame
+except ImportError:
+    lz4_frame = None
+
+# "stdjson" marks bodies written by stdlib json (orjson missing, or a value it refuses such as
+# an integer beyond 64 bits). They are read back with json.loads: orjson would turn such
+# integers into floats.
+SERIALIZERS = {"json": 1, "msgpack": 2, "stdjson": 3}
+COMPRESSIONS = {"none": 0, "zstd": 1, "lz4": 2}
+
+# Header byte layout: (compression << 2) | serializer.
+# Every valid header is < 0x20, so it can never collide with legacy JSON text
+# (which always starts with a printable character) and old entries stay readable.
+_MAX_HEADER = 0x1F
+
+def _header(serializer, compression):
+    return bytes([(COMPRESSIONS[compression] << 2) | SERIALIZERS[serializer]])
+
+class Codec:
+    """
+    Binary value codec for RootPulse caches and messages.
+    Serializes with orjson/json or msgpack and compresses payloads above a size threshold.
+    A one-byte header records the format so readers never need configuration.
+    """
+
+    def __init__(self, serializer="json", compression="zstd", threshold=1024, level=3):
+        if serializer not in SERIALIZERS:
+            raise ValueError(f"Unsupported serializer: {serializer}")
+        if compression not in COMPRESSIONS:
+            raise ValueError(f"Unsupported compression: {compression}")
+        if serializer == "msgpack" and msgpack is None:
+            logger.warning("msgpack not installed, falling back to json codec")
+            serializer = "json"
+        if compression == "zstd" and zstandard is None:
+            compression = "none"
+        if compression == "lz4" and lz4_frame is None:
+            compression = "none"
+
+        self.serializer = serializer
+        self.compression = compression
+        self.threshold = threshold
+        self.level = level
+        self._zstd_c = zstandard.ZstdCompressor(level=level) if zstandard else None
+        self._zstd_d = zstandard.ZstdDecompressor() if zstandard else None
+
+    @classmethod
+    def from_env(cls, prefix="REDIS", compression="zstd"):
+        return cls(
+            serializer=os.getenv(f"{prefix}_CODEC", "json").lower(),
+            compression=os.getenv(f"{prefix}_COMPRESSION", compression).lower(),
+            threshold=int(os.getenv(f"{prefix}_COMPRESSION_THRESHOLD", "1024")),
+            level=int(os.getenv(f"{prefix}_COMPRESSION_LEVEL", "3")),
+        )
+
+    # --- Serialization ---
+    def _serialize(self, value, fallback=True):
+        """
+        Returns (body, serializer). Values the configured serializer cannot represent
+        (integers beyond 64 bits) are written with stdlib json when `fallback` is set,
+        otherwise they raise ValueError.
+        """
+        try:
+            if self.serializer == "msgpack":
+                return msgpack.packb(value, use_bin_type=True), "msgpack"
+            if orjson is not None:
+                return orjson.dumps(value, option=orjson.OPT_NON_STR_KEYS), "json"
+        except (TypeError, OverflowError) as e:
+            if not fallback:
+                raise ValueError(f"Value cannot be encoded as {self.serializer}: {str(e)}") from e
+        return json.dumps(value, separators=(",", ":")).encode(), "stdjson"
+
+    @staticmethod
+    def _deserialize(serializer, data):
+        if serializer == SERIALIZERS["msgpack"]:
+            if msgpack is None:
+                raise RuntimeError("msgpack payload received but msgpack is not installed")
+            # Int keys are valid in our payloads (the JSON path stringifies them instead)
+            return msgpack.unpackb(data, raw=False, strict_map_key=False)
+        if orjson is not None and serializer != SERIALIZERS["stdjson"]:
+            return orjson.loads(data)
+        return json.loads(data)
+
+    # --- Compression ---
+    def _compress(self, data):
+        if self.compression == "zstd":
+            return self._zstd_c.compress(data)
+        if self.compression == "lz4":
+            return lz4_frame.compress(data, compression_level=self.level)
+        return data
+
+    def _decompress(self, compression, data):
+        if compression == COMPRESSIONS["zstd"]:
+            if self._zstd_d is None:
+                raise RuntimeError("zstd payload received but zstandard is not installed")
+            return self._zstd_d.decompress(data)
+        if compression == COMPRESSIONS["lz4"]:
+            if lz4_frame is None:
+                raise RuntimeError("lz4 payload received but lz4 is not installed")
+            return lz4_frame.decompress(data)
+        return data
+
+    # --- Public API ---
+    def _encode(self, value, fallback):
+        body, serializer = self._serialize(value, fallback)
+        compression = "none"
+        if self.compression != "none" and len(body) >= self.threshold:
+            compressed = self._compress(body)
+            # Keep the raw body when compression does not pay for itself
+            if len(compressed) < len(body):
+                body, compression = compressed, self.compression
+        return body, serializer, compression
+
+    def encode(self, value):
+        """
+        Headerless variant of dumps() for transports that carry the format out of band
+        (e.g. AMQP content_type/content_encoding). Returns (body, compression).
+        There is no room to flag a stdlib json fallback, so unrepresentable values raise ValueError.
+        """
+        body, _, compression = self._encode(value, fallback=False)
+        return body, compression
+
+    def decode(self, data, serializer="json", compression="none"):
+        return self._deserialize(SERIALIZERS[serializer], self._decompress(COMPRESSIONS[compression], data))
+
+    def dumps(self, value):
+        body, serializer, compression = self._encode(value, fallback=True)
+        return _header(serializer, compression) + body
+
+    def loads(self, data):
+        if data is None:
+            return None
+        if isinstance(data, str):
+            data = data.encode()
+        if not data:
+            return None
+        header = data[0]
+        if header > _MAX_HEADER:
+            # Legacy entry written as plain JSON text
+            return json.loads(data)
+        body = self._decompress(header >> 2, data[1:])
+        return self._deserialize(header & 0x03, body)
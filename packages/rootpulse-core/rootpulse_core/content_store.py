@@ -0,0 +1,176 @@
+import os
+import hashlib
+import logging
+import tempfile
+from datetime import datetime, timedelta
+from typing import Any, Dict, Optional
+from botocore.exceptions import ClientError
+from sqlalchemy import select, update, delete
+from sqlalchemy.dialects.postgresql import insert
+from .cache import cache
+from .storage import storage_service
+from .models.storage import StoredObject
+from .observability.metrics import get_meter
+
+logger = logging.getLogger(__name__)
+meter = get_meter(__name__)
+
+dedup_hits_counter = meter.create_counter("storage.dedup.hits", description="Uploads that reused an existing object")
+dedup_saved_bytes_counter = meter.create_counter("storage.dedup.saved_bytes", unit="By", description="Bytes not written thanks to deduplication")
+
+class ContentStore:
+    """
+    Content-addressed, deduplicating uploads on top of StorageService.
+    - The stream is hashed (sha256) while it is spooled, so the key is known before
+      anything is written; identical content always maps to `cas/<aa>/<digest>`
+    - Existing objects are detected with a Redis existence cache, then a HEAD, and
+      the write is skipped
+    - Every put() takes a reference in the `stored_objects` table and every release()
+      drops one; collect_garbage() only deletes objects nobody references
+
+    Usage:
+        content_store = ContentStore(AsyncSessionLocal)
+        stored = await content_store.put(upload_file, content_type=upload_file.content_type)
+        profile.profile_photo_url = stored["key"]
+    """
+
+    def __init__(self, session_factory, prefix: str = "cas", storage=None):
+        self.session_factory = session_factory
+        self.prefix = prefix
+        self.storage = storage or storage_service
+        self.chunk_size = int(os.getenv("S3_DEDUP_CHUNK_SIZE", str(1024 * 1024)))
+        self.spool_size = int(os.getenv("S3_DEDUP_SPOOL_SIZE", str(8 * 1024 * 1024)))
+        self.exists_ttl = int(os.getenv("S3_DEDUP_EXISTS_TTL", "86400"))
+
+    def key_for(self, digest: str) -> str:
+        return f"{self.prefix}/{digest[:2]}/{digest}"
+
+    @staticmethod
+    def _exists_key(digest: str) -> str:
+        return f"storage:cas:{digest}"
+
+    async def _spool(self, file_obj):
+        """
+        Copy the stream into a SpooledTemporaryFile (memory up to S3_DEDUP_SPOOL_SIZE,
+        then disk) while hashing it. Hashing and writing run off the event loop.
+        """
+        digest = hashlib.sha256()
+        spool = tempfile.SpooledTemporaryFile(max_size=self.spool_size)
+        size = 0
+
+        def absorb(chunk):
+            digest.update(chunk)
+            spool.write(chunk)
+
+        try:
+            while True:
+                chunk = await self.storage._read(file_obj, self.chunk_size)
+                if not chunk:
+                    break
+                await self.storage._run(absorb, chunk)
+                size += len(chunk)
+            spool.seek(0)
+        except BaseException:
+            spool.close()
+            raise
+        return spool, digest.hexdigest(), size
+
+    async def _object_exists(self, digest: str, key: str) -> bool:
+        try:
+            if await cache.get_client().exists(self._exists_key(digest)):
+                return True
+        except Exception as e:
+            logger.warning(f"Dedup existence cache unavailable: {str(e)}")
+        try:
+            await self.storage._run(self.storage.client.head_object, Bucket=self.storage.bucket, Key=key)
+        except ClientError as e:
+            if e.response.get("ResponseMetadata", {}).get("HTTPStatusCode") == 404:
+                return False
+            raise
+        await self._remember(digest)
+        return True
+
+    async def _remember(self, digest: str):
+        try:
+            await cache.get_client().set(self._exists_key(digest), 1, ex=self.exists_ttl)
+        except Exception as e:
+            logger.warning(f"Failed to cache object existence for {digest}: {str(e)}")
+
+    async def _add_reference(self, digest: str, key: str, size: int, content_type: Optional[str]):
+        """
+        Upsert the row and bump ref_count. The row lock serializes this with
+        collect_garbage(), so an object is never deleted under a new reference.
+        """
+        stmt = insert(StoredObject).values(
+            digest=digest, key=key, size=size, content_type=content_type, ref_count=1
+        ).on_conflict_do_update(
+            index_elements=[StoredObject.digest],
+            set_={"ref_count": StoredObject.ref_count + 1, "updated_at": datetime.utcnow()},
+        )
+        async with self.session_factory() as session:
+            await session.execute(stmt)
+            await session.commit()
+
+    async def put(self, file_obj, content_type: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Store `file_obj` (UploadFile or binary file object) once per distinct content.
+        Returns {"key", "digest", "size", "deduplicated"}; the caller owns one reference.
+        """
+        spool, digest, size = await self._spool(file_obj)
+        key = self.key_for(digest)
+        try:
+            # Reference first: from here on garbage collection cannot remove the object
+            await self._add_reference(digest, key, size, content_type)
+            try:
+                exists = await self._object_exists(digest, key)
+                if not exists:
+                    await self.storage.upload_stream(spool, key, content_type=content_type)
+            except BaseException:
+                # The caller never receives this reference, so nobody else would drop it
+                await self.release(digest)
+                raise
+            if exists:
+                dedup_hits_counter.add(1)
+                dedup_saved_bytes_counter.add(size)
+                return {"key": key, "digest": digest, "size": size, "deduplicated": True}
+            await self._remember(digest)
+            return {"key": key, "digest": digest, "size": size, "deduplicated": False}
+        finally:
+            spool.close()
+
+    async def release(self, digest: str):
+        """
+        Drop one reference, e.g. when a profile photo is replaced or a document deleted.
+        """
+        async with self.session_factory() as session:
+            await session.execute(
+                update(StoredObject)
+                .where(StoredObject.digest == digest, StoredObject.ref_count > 0)
+                .values(ref_count=StoredObject.ref_count - 1, updated_at=datetime.utcnow())
+            )
+            await session.commit()
+
+    async def collect_garbage(self, grace_seconds: int = 3600, batch_size: int = 100) -> int:
+        """
+        Delete objects unreferenced for at least `grace_seconds`. Rows are claimed with
+        FOR UPDATE SKIP LOCKED, so it is safe to run on several workers at once.
+        Returns the number of objects removed.
+        """
+        cutoff = datetime.utcnow() - timedelta(seconds=grace_seconds)
+        async with self.session_factory() as session:
+            rows = (await session.execute(
+                select(StoredObject)
+                .where(StoredObject.ref_count <= 0, StoredObject.updated_at < cutoff)
+                .limit(batch_size)
+                .with_for_update(skip_locked=True)
+            )).scalars().all()
+            for row in rows:
+                # Forget existence before the object goes, so a concurrent put() re-uploads
+                await cache.get_client().delete(self._exists_key(row.digest))
+                await self.storage._run(self.storage.client.delete_object, Bucket=self.storage.bucket, Key=row.key)
+            if rows:
+                await session.execute(delete(StoredObject).where(StoredObject.id.in_([row.id for row in rows])))
+            await session.commit()
+        if rows:
+            logger.info(f"Garbage collected {len(rows)} unreferenced objects")
+        return len(rows)
@@ -0,0 +1,25 @@
+from datetime import datetime
+from sqlalchemy import Column, String, Integer, DateTime, Text, Index
+from sqlalchemy.dialects.postgresql import JSONB
+from .base import BaseRootPulseModel
+
+class OutboxEvent(BaseRootPulseModel):
+    """
+    Event written in the same transaction as the business change and published
+    afterwards by rootpulse_core.outbox.OutboxRelay. The row id is the message id.
+    """
+    __tablename__ = 'outbox_events'
+
+    exchange = Column(String(255), nullable=False)
+    routing_key = Column(String(255), nullable=False)
+    event_type = Column(String(255), nullable=False)
+    payload = Column(JSONB, nullable=False)
+    available_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    published_at = Column(DateTime, nullable=True)
+    attempts = Column(Integer, default=0, nullable=False)
+    last_error = Column(Text, nullable=True)
+
+    __table_args__ = (
+        # The relay only ever scans unpublished rows
+        Index('ix_outbox_events_pending', 'available_at', postgresql_where=published_at.is_(None)),
+    )
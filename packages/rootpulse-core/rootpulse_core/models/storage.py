@@ -0,0 +1,15 @@
+from sqlalchemy import Column, String, BigInteger, Integer
+from .base import BaseRootPulseModel
+
+class StoredObject(BaseRootPulseModel):
+    """
+    Reference-counted content-addressed object in S3/MinIO (see rootpulse_core.content_store).
+    Rows with ref_count 0 are removed, together with their object, by garbage collection.
+    """
+    __tablename__ = 'stored_objects'
+
+    digest = Column(String(64), nullable=False, unique=True, index=True) # sha256 hex
+    key = Column(String(255), nullable=False)
+    size = Column(BigInteger, nullable=False)
+    content_type = Column(String(255), nullable=True)
+    ref_count = Column(Integer, nullable=False, default=0)
@@ -0,0 +1,25 @@
+import os
+from opentelemetry import metrics
+from opentelemetry.exporter.otlp.proto.grpc.metric_exporter import OTLPMetricExporter
+from opentelemetry.sdk.metrics import MeterProvider
+from opentelemetry.sdk.metrics.export import PeriodicExportingMetricReader
+from opentelemetry.sdk.resources import SERVICE_NAME, Resource
+
+def setup_metrics(service_name):
+    """
+    Standardizes OpenTelemetry metrics export across all services.
+    Instruments created through get_meter() before this call are no-ops until a provider is set.
+    """
+    endpoint = os.getenv('OTEL_EXPORTER_OTLP_ENDPOINT', "http://localhost:4317")
+    interval = int(os.getenv('OTEL_METRIC_EXPORT_INTERVAL', "15000"))
+
+    resource = Resource(attributes={
+        SERVICE_NAME: service_name
+    })
+
+    reader = PeriodicExportingMetricReader(OTLPMetricExporter(endpoint=endpoint), export_interval_millis=interval)
+    provider = MeterProvider(resource=resource, metric_readers=[reader])
+    metrics.set_meter_provider(provider)
+
+def get_meter(name):
+    return metrics.get_meter(name)
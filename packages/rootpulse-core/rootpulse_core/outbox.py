@@ -0,0 +1,145 @@
+import os
+import time
+import asyncio
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Optional
+from sqlalchemy import select, delete
+from sqlalchemy.ext.asyncio import AsyncSession
+from .bus.rabbitmq import bus as rabbitmq_bus
+from .models.outbox import OutboxEvent
+from .observability.metrics import get_meter
+
+logger = logging.getLogger(__name__)
+meter = get_meter(__name__)
+
+relayed_counter = meter.create_counter("outbox.relayed", description="Outbox events published and confirmed")
+relay_failed_counter = meter.create_counter("outbox.failed", description="Outbox publish attempts that were not confirmed")
+relay_lag_histogram = meter.create_histogram("outbox.lag", unit="s", description="Commit to confirmed publish latency")
+
+# One switch for both halves: rows are only staged when a relay publishes and prunes them,
+# otherwise outbox_events would grow forever with nothing ever sent
+RELAY_ENABLED = os.getenv("OUTBOX_RELAY_ENABLED", "false").lower() == "true"
+
+def add_event(session: AsyncSession, exchange: str, routing_key: str, event_type: str, data: Dict[str, Any]) -> Optional[OutboxEvent]:
+    """
+    Stage an event in the caller's transaction; it is published only if that transaction commits.
+    A no-op returning None unless OUTBOX_RELAY_ENABLED=true.
+
+        add_event(db, "iam", "user.registered", "user.registered", {"user_id": str(user.id)})
+        await db.commit()
+    """
+    if not RELAY_ENABLED:
+        return None
+    event = OutboxEvent(exchange=exchange, routing_key=routing_key, event_type=event_type, payload=data)
+    session.add(event)
+    return event
+
+class OutboxRelay:
+    """
+    Publishes committed outbox rows through the bus with publisher confirms.
+    - Rows are claimed in batches with FOR UPDATE SKIP LOCKED, so any number of
+      relays (one per worker/pod) can run without publishing a row twice concurrently
+    - A whole batch is in flight at once; rows are marked published only after the ack
+    - Unconfirmed rows are retried with exponential backoff
+    - The row id is sent as the message id, so consumers' idempotency drops the
+      duplicate if a relay dies between the ack and its commit
+    - Confirms are awaited at most OUTBOX_PUBLISH_TIMEOUT seconds, which also bounds
+      how long a batch holds its row locks
+    - Published rows older than OUTBOX_RETENTION_DAYS are pruned every OUTBOX_PRUNE_INTERVAL seconds
+
+    Enabled with OUTBOX_RELAY_ENABLED=true (default false), which also turns on add_event().
+
+    Usage:
+        relay = OutboxRelay(AsyncSessionLocal)
+        asyncio.create_task(relay.run_forever())
+    """
+
+    def __init__(self, session_factory, batch_size: int = None, interval: float = None, max_backoff: float = 300.0, bus=None):
+        self.session_factory = session_factory
+        self.batch_size = batch_size or int(os.getenv("OUTBOX_BATCH_SIZE", "200"))
+        self.interval = interval or float(os.getenv("OUTBOX_POLL_INTERVAL", "0.5"))
+        self.max_backoff = max_backoff
+        self.bus = bus or rabbitmq_bus
+        self.publish_timeout = float(os.getenv("OUTBOX_PUBLISH_TIMEOUT", "10"))
+        self.prune_interval = float(os.getenv("OUTBOX_PRUNE_INTERVAL", "3600"))
+        self.retention = timedelta(days=float(os.getenv("OUTBOX_RETENTION_DAYS", "7")))
+        self._last_prune = 0.0
+
+    async def relay_batch(self) -> int:
+        """
+        Claim, publish and mark one batch. Returns the number of rows claimed.
+        """
+        now = datetime.utcnow()
+        async with self.session_factory() as session:
+            rows = (await session.execute(
+                select(OutboxEvent)
+                .where(OutboxEvent.published_at.is_(None), OutboxEvent.available_at <= now)
+                .order_by(OutboxEvent.available_at)
+                .limit(self.batch_size)
+                .with_for_update(skip_locked=True)
+            )).scalars().all()
+            if not rows:
+                return 0
+
+            results = await asyncio.gather(
+                *(
+                    self.bus.publish_event(
+                        row.exchange, row.routing_key, row.event_type, row.payload,
+                        message_id=str(row.id), timestamp=row.created_at.replace(tzinfo=timezone.utc),
+                        timeout=self.publish_timeout,
+                    )
+                    for row in rows
+                ),
+                return_exceptions=True,
+            )
+            published_at = datetime.utcnow()
+            for row, result in zip(rows, results):
+                if isinstance(result, BaseException):
+                    row.attempts += 1
+                    row.last_error = str(result)[:2000]
+                    row.available_at = published_at + timedelta(seconds=min(self.max_backoff, 2 ** row.attempts))
+                    relay_failed_counter.add(1, {"exchange": row.exchange})
+                else:
+                    row.published_at = published_at
+                    relayed_counter.add(1, {"exchange": row.exchange})
+                    if row.created_at:
+                        relay_lag_histogram.record((published_at - row.created_at).total_seconds(), {"exchange": row.exchange})
+            await session.commit()
+        return len(rows)
+
+    async def prune(self, older_than: timedelta = None) -> int:
+        """
+        Delete rows published before `older_than` (default OUTBOX_RETENTION_DAYS) ago.
+        """
+        async with self.session_factory() as session:
+            result = await session.execute(
+                delete(OutboxEvent).where(OutboxEvent.published_at < datetime.utcnow() - (older_than or self.retention))
+            )
+            await session.commit()
+        return result.rowcount or 0
+
+    async def run_forever(self):
+        """
+        Background loop for service startup. Drains back-to-back while batches come back full.
+        """
+        while True:
+            if time.monotonic() - self._last_prune >= self.prune_interval:
+                self._last_prune = time.monotonic()
+                try:
+                    pruned = await self.prune()
+                    if pruned:
+                        logger.info(f"Pruned {pruned} published outbox events")
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    logger.error(f"Outbox prune failed: {str(e)}")
+            try:
+                claimed = await self.relay_batch()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Outbox relay failed: {str(e)}")
+                claimed = 0
+            if claimed < self.batch_size:
+                await asyncio.sleep(self.interval)
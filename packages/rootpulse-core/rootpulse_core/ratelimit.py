@@ -0,0 +1,156 @@
+import os
+import math
+import hashlib
+import logging
+from typing import Callable, Iterable, Optional, Union
+from fastapi import HTTPException, Request, Response
+from jose import jwt, JWTError
+from redis.exceptions import NoScriptError
+from .cache import cache
+
+logger = logging.getLogger(__name__)
+
+# Token bucket evaluated atomically inside Redis.
+# Uses the server clock so every pod/worker shares one notion of time.
+# Returns {allowed, tokens_left, retry_after_s, reset_s}; floats as strings (Lua truncates numbers).
+TOKEN_BUCKET_SCRIPT = """
+local rate = tonumber(ARGV[1])
+local capacity = tonumber(ARGV[2])
+local cost = tonumber(ARGV[3])
+local t = redis.call('TIME')
+local now = tonumber(t[1]) + tonumber(t[2]) / 1000000
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(state[1]) or capacity
+local ts = tonumber(state[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate)
+local allowed = 0
+local retry_after = 0
+if tokens >= cost then
+    tokens = tokens - cost
+    allowed = 1
+else
+    retry_after = (cost - tokens) / rate
+end
+redis.call('HSET', KEYS[1], 'tokens', tokens, 'ts', now)
+redis.call('PEXPIRE', KEYS[1], math.ceil(capacity / rate * 1000) + 1000)
+return {allowed, tostring(tokens), tostring(retry_after), tostring((capacity - tokens) / rate)}
+"""
+TOKEN_BUCKET_SHA = hashlib.sha1(TOKEN_BUCKET_SCRIPT.encode()).hexdigest()
+
+RATE_LIMIT_ENABLED = os.getenv("RATE_LIMIT_ENABLED", "true").lower() == "true"
+
+class RateLimiter:
+    """
+    Distributed token-bucket rate limiter backed by a Redis Lua script.
+    `limit` requests per `period` seconds, with bursts of up to `burst` requests.
+    """
+
+    def __init__(self, limit: int, period: float = 1.0, burst: Optional[int] = None, prefix: str = "ratelimit", redis=None):
+        self.limit = limit
+        self.period = period
+        self.rate = limit / period
+        self.capacity = burst or limit
+        self.prefix = prefix
+        self.redis = redis or cache
+
+    async def hit(self, key: str, cost: int = 1):
+        """
+        Consume `cost` tokens for `key`.
+        Returns (allowed, remaining, retry_after_seconds, reset_seconds).
+        """
+        client = self.redis.get_client()
+        bucket = f"{self.prefix}:{key}"
+        args = [self.rate, self.capacity, cost]
+        try:
+            result = await client.evalsha(TOKEN_BUCKET_SHA, 1, bucket, *args)
+        except NoScriptError:
+            result = await client.eval(TOKEN_BUCKET_SCRIPT, 1, bucket, *args)
+        allowed, tokens, retry_after, reset = result
+        return bool(int(allowed)), int(float(tokens)), float(retry_after), float(reset)
+
+# --- Key extraction ---
+# Number of proxies in front of the service that append to X-Forwarded-For (Kong = 1,
+# nginx -> Kong = 2). Everything left of the address they appended is client-controlled.
+TRUSTED_PROXY_HOPS = int(os.getenv("RATE_LIMIT_TRUSTED_PROXY_HOPS", "1"))
+# Optional header the edge proxy always overwrites (e.g. "x-real-ip"); preferred when set
+REAL_IP_HEADER = os.getenv("RATE_LIMIT_REAL_IP_HEADER", "").lower()
+
+def client_ip(request: Request) -> str:
+    if REAL_IP_HEADER:
+        real_ip = request.headers.get(REAL_IP_HEADER)
+        if real_ip:
+            return real_ip.strip()
+    forwarded = request.headers.get("x-forwarded-for")
+    if forwarded and TRUSTED_PROXY_HOPS > 0:
+        hops = [hop.strip() for hop in forwarded.split(",") if hop.strip()]
+        # Proxies append, so the client address is the one our outermost trusted proxy added
+        if len(hops) >= TRUSTED_PROXY_HOPS:
+            return hops[-TRUSTED_PROXY_HOPS]
+    return request.client.host if request.client else "unknown"
+
+def user_identity(request: Request) -> str:
+    """
+    Subject of the bearer token, falling back to the client IP for anonymous calls.
+    The token is not verified here; authentication happens in get_current_user.
+    """
+    auth = request.headers.get("authorization", "")
+    if auth.lower().startswith("bearer "):
+        try:
+            claims = jwt.get_unverified_claims(auth[7:])
+            if claims.get("sub"):
+                return f"user:{claims['sub']}"
+        except JWTError:
+            pass
+    return f"ip:{client_ip(request)}"
+
+def route_identity(request: Request) -> str:
+    route = request.scope.get("route")
+    return f"{request.method}:{getattr(route, 'path', request.url.path)}"
+
+KEY_FUNCTIONS = {
+    "ip": lambda request: f"ip:{client_ip(request)}",
+    "user": user_identity,
+    "route": route_identity,
+}
+
+def rate_limit(
+    limit: int,
+    period: float = 1.0,
+    burst: Optional[int] = None,
+    key_by: Iterable[Union[str, Callable[[Request], str]]] = ("ip", "route"),
+    scope: Optional[str] = None,
+    cost: int = 1,
+):
+    """
+    FastAPI dependency factory enforcing a shared (cross-pod) rate limit.
+    `key_by` combines "ip", "user", "route" or custom callables into the bucket key.
+    Sets RateLimit-Limit/Remaining/Reset headers; raises 429 with Retry-After when exceeded.
+    Fails open if Redis is unavailable.
+
+    Usage:
+        @router.post("/login", dependencies=[Depends(rate_limit(5, 60, key_by=("ip",)))])
+    """
+    limiter = RateLimiter(limit, period, burst, prefix=f"ratelimit:{scope}" if scope else "ratelimit")
+    key_functions = [KEY_FUNCTIONS[k] if isinstance(k, str) else k for k in key_by]
+
+    async def dependency(request: Request, response: Response):
+        if not RATE_LIMIT_ENABLED:
+            return
+        key = "|".join(fn(request) for fn in key_functions)
+        try:
+            allowed, remaining, retry_after, reset = await limiter.hit(key, cost)
+        except Exception as e:
+            logger.warning(f"Rate limiter unavailable, allowing request: {str(e)}")
+            return
+
+        headers = {
+            "RateLimit-Limit": str(limiter.capacity),
+            "RateLimit-Remaining": str(max(0, remaining)),
+            "RateLimit-Reset": str(math.ceil(reset)),
+        }
+        if not allowed:
+            headers["Retry-After"] = str(max(1, math.ceil(retry_after)))
+            raise HTTPException(status_code=429, detail="Too many requests", headers=headers)
+        response.headers.update(headers)
+
+    return dependency
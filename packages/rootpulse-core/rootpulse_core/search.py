@@ -1,49 +1,215 @@
 import os
+import re
+import json
+import asyncio
+import hashlib
 import logging
-import meilisearch
-from typing import List, Dict, Any
+import httpx
+from typing import List, Dict, Any, Optional
+from .cache import cache
 
 logger = logging.getLogger(__name__)
 
+# Worth retrying: Meilisearch overloaded/restarting or rate limited
+RETRY_STATUSES = {429, 502, 503, 504}
+
+_WHITESPACE = re.compile(r"\s+")
+
 class MeilisearchService:
     """
     Standardized Meilisearch integration for RootPulse.
     Provides <50ms search latency and async sync helpers.
+    Talks to the Meilisearch REST API over a pooled httpx.AsyncClient so searches
+    never block the event loop.
+    Search results are cached per index version; every write to an index bumps its
+    version, so cached results for the old contents are never served again.
     """
 
     def __init__(self, url=None, api_key=None):
-        self.url = url or os.getenv("MEILI_URL", "http://localhost:7700")
+        self.url = (url or os.getenv("MEILI_URL", "http://localhost:7700")).rstrip("/")
         self.api_key = api_key or os.getenv("MEILI_MASTER_KEY", "master_key")
-        self._client = None
+        self.timeout = float(os.getenv("MEILI_TIMEOUT", "5"))
+        self.max_connections = int(os.getenv("MEILI_MAX_CONNECTIONS", "50"))
+        self.retries = int(os.getenv("MEILI_RETRIES", "2"))
+        self.cache_enabled = os.getenv("SEARCH_CACHE_ENABLED", "true").lower() == "true"
+        self.cache_ttl = int(os.getenv("SEARCH_CACHE_TTL", "300"))
+        self._client: Optional[httpx.AsyncClient] = None
 
     @property
-    def client(self):
-        if self._client is None:
-            self._client = meilisearch.Client(self.url, self.api_key)
+    def client(self) -> httpx.AsyncClient:
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                base_url=self.url,
+                headers={"Authorization": f"Bearer {self.api_key}"},
+                timeout=httpx.Timeout(self.timeout, connect=2.0),
+                limits=httpx.Limits(
+                    max_connections=self.max_connections,
+                    max_keepalive_connections=self.max_connections,
+                    keepalive_expiry=60.0,
+                ),
+            )
             logger.info(f"Connected to Meilisearch at {self.url}")
         return self._client
 
-    async def search(self, index_name: str, query: str, options: Dict[str, Any] = None) -> Dict[str, Any]:
+    async def close(self):
+        """
+        Shutdown hook, e.g. `app.add_event_handler("shutdown", search_service.close)`.
+        """
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def _request(self, method: str, path: str, **kwargs) -> Any:
+        """
+        Issue a request with exponential-backoff retries on transport errors and
+        retryable statuses. Raises httpx.HTTPStatusError for other failures.
+        """
+        delay = 0.1
+        for attempt in range(self.retries + 1):
+            try:
+                response = await self.client.request(method, path, **kwargs)
+                if response.status_code not in RETRY_STATUSES or attempt == self.retries:
+                    response.raise_for_status()
+                    return response.json() if response.content else None
+                logger.warning(f"Meilisearch {method} {path} returned {response.status_code}, retrying")
+            except httpx.TransportError as e:
+                if attempt == self.retries:
+                    logger.error(f"Meilisearch {method} {path} failed: {str(e)}")
+                    raise
+                logger.warning(f"Meilisearch {method} {path} transport error, retrying: {str(e)}")
+            await asyncio.sleep(delay)
+            delay *= 2
+
+    # --- Result cache ---
+    @staticmethod
+    def _version_key(index_name: str) -> str:
+        return f"{{search:{index_name}}}:version"
+
+    @staticmethod
+    def _result_prefix(index_name: str) -> str:
+        return f"{{search:{index_name}}}:v"
+
+    @staticmethod
+    def _query_hash(query: str, options: Dict[str, Any]) -> str:
+        normalized = _WHITESPACE.sub(" ", query or "").strip().lower()
+        raw = json.dumps([normalized, options], sort_keys=True, default=str)
+        return hashlib.md5(raw.encode()).hexdigest()
+
+    async def bump_version(self, *index_names: str):
+        """
+        Invalidate every cached result for the given indexes.
+        """
+        if not self.cache_enabled:
+            return
+        try:
+            for index_name in index_names:
+                await cache.get_client().incr(self._version_key(index_name))
+        except Exception as e:
+            logger.warning(f"Failed to bump search cache version for {index_names}: {str(e)}")
+
+    async def search(self, index_name: str, query: str, options: Dict[str, Any] = None, use_cache: bool = True) -> Dict[str, Any]:
         """
         Perform a search on a specific index.
         """
-        return self.client.index(index_name).search(query, options or {})
+        body = dict(options or {})
+        if not (self.cache_enabled and use_cache):
+            body["q"] = query
+            return await self._request("POST", f"/indexes/{index_name}/search", json=body)
 
-    async def add_documents(self, index_name: str, documents: List[Dict[str, Any]]):
+        query_hash = self._query_hash(query, body)
+        prefix = self._result_prefix(index_name)
+        version = None
+        try:
+            # The result key depends on the version, so these are two plain GETs (a script
+            # would have to read a key it cannot declare up front)
+            client = cache.get_binary_client()
+            version = await client.get(self._version_key(index_name)) or b"0"
+            version = version.decode() if isinstance(version, bytes) else version
+            cached = await client.get(f"{prefix}{version}:{query_hash}")
+            if cached:
+                return cache.codec.loads(cached)
+        except Exception as e:
+            logger.warning(f"Search cache unavailable: {str(e)}")
+
+        body["q"] = query
+        result = await self._request("POST", f"/indexes/{index_name}/search", json=body)
+        if version is not None:
+            try:
+                await cache.set_value(f"{prefix}{version}:{query_hash}", result, ex=self.cache_ttl)
+            except Exception as e:
+                logger.warning(f"Failed to cache search result: {str(e)}")
+        return result
+
+    async def add_documents(self, index_name: str, documents: List[Dict[str, Any]], primary_key: Optional[str] = None):
         """
         Add or update documents in a specific index.
         Used for background sync from PostgreSQL.
+        Returns the enqueued task (use wait_for_task to await indexing).
         """
-        return self.client.index(index_name).add_documents(documents)
+        params = {"primaryKey": primary_key} if primary_key else None
+        task = await self._request("POST", f"/indexes/{index_name}/documents", json=documents, params=params)
+        await self.bump_version(index_name)
+        return task
+
+    async def delete_documents(self, index_name: str, document_ids: List[Any]):
+        """
+        Remove documents by primary key. Returns the enqueued task.
+        """
+        task = await self._request("POST", f"/indexes/{index_name}/documents/delete-batch", json=list(document_ids))
+        await self.bump_version(index_name)
+        return task
+
+    async def create_index(self, index_name: str, primary_key: Optional[str] = None):
+        body = {"uid": index_name}
+        if primary_key:
+            body["primaryKey"] = primary_key
+        return await self._request("POST", "/indexes", json=body)
+
+    async def swap_indexes(self, pairs: List[List[str]]):
+        """
+        Atomically swap the contents of index pairs, e.g. [["products", "products_tmp"]].
+        """
+        task = await self._request("POST", "/swap-indexes", json=[{"indexes": pair} for pair in pairs])
+        await self.bump_version(*[index_name for pair in pairs for index_name in pair])
+        return task
 
     async def update_settings(self, index_name: str, settings: Dict[str, Any]):
         """
         Update index settings (sortable, filterable attributes, etc.)
         """
-        return self.client.index(index_name).update_settings(settings)
+        task = await self._request("PATCH", f"/indexes/{index_name}/settings", json=settings)
+        await self.bump_version(index_name)
+        return task
 
     async def delete_index(self, index_name: str):
-        return self.client.delete_index(index_name)
+        task = await self._request("DELETE", f"/indexes/{index_name}")
+        await self.bump_version(index_name)
+        return task
+
+    async def get_task(self, task_uid: int) -> Dict[str, Any]:
+        return await self._request("GET", f"/tasks/{task_uid}")
+
+    async def wait_for_task(self, task_uid: int, timeout: float = 60.0, interval: float = 0.05) -> Dict[str, Any]:
+        """
+        Poll a task until it succeeds or fails. Raises TimeoutError if it is still running after `timeout`.
+        """
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        while True:
+            task = await self.get_task(task_uid)
+            if task.get("status") in ("succeeded", "failed", "canceled"):
+                if task.get("status") == "succeeded":
+                    # Searches issued while the task was queued may have cached pre-write results
+                    indexes = [task["indexUid"]] if task.get("indexUid") else []
+                    for swap in (task.get("details") or {}).get("swaps") or []:
+                        indexes.extend(swap.get("indexes", []))
+                    if indexes:
+                        await self.bump_version(*indexes)
+                return task
+            if loop.time() >= deadline:
+                raise TimeoutError(f"Meilisearch task {task_uid} did not finish within {timeout}s")
+            await asyncio.sleep(interval)
+            interval = min(interval * 2, 1.0)
 
 # Singleton instance
 search_service = MeilisearchService()
@@ -0,0 +1,253 @@
+import os
+import time
+import uuid
+import asyncio
+import logging
+from collections import deque
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from enum import Enum
+from typing import Any, Callable, Dict, Iterable, Optional, Tuple
+from sqlalchemy import select, tuple_
+from .cache import cache
+from .search import search_service
+
+logger = logging.getLogger(__name__)
+
+def _json_safe(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, uuid.UUID):
+        return str(value)
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, Enum):
+        return value.value
+    return value
+
+class IndexTaskError(RuntimeError):
+    pass
+
+class SyncLockLost(RuntimeError):
+    pass
+
+class SearchIndexer:
+    """
+    Incremental PostgreSQL -> Meilisearch sync for BaseRootPulseModel tables.
+    - Rows changed since the stored watermark are read with keyset pagination on
+      (updated_at, id) in bounded chunks; soft-deleted rows (deleted_at set) are removed
+    - updated_at is stamped by the application before commit, so scans stop `lag` seconds
+      (SEARCH_SYNC_LAG) short of now: a slow transaction committing an older timestamp
+      is still ahead of the watermark when it becomes visible
+    - At most `max_pending_tasks` Meilisearch tasks are in flight (backpressure);
+      the watermark only advances once the tasks covering it have succeeded
+    - reindex() rebuilds into a temporary index and swaps it in atomically
+    - A Redis lock makes it safe to schedule on every worker/pod; it is renewed after every
+      chunk and settled task, and a run that loses it stops before writing a watermark
+
+    Usage:
+        product_indexer = SearchIndexer(Product, "products", AsyncSessionLocal, fields=[...])
+        await product_indexer.sync()
+    """
+
+    def __init__(
+        self,
+        model,
+        index_name: str,
+        session_factory,
+        fields: Optional[Iterable[str]] = None,
+        exclude: Iterable[str] = (),
+        serializer: Optional[Callable[[Any], Dict[str, Any]]] = None,
+        settings: Optional[Dict[str, Any]] = None,
+        primary_key: str = "id",
+        chunk_size: Optional[int] = None,
+        max_pending_tasks: int = 2,
+        task_timeout: float = 300.0,
+        lag: Optional[float] = None,
+        service=None,
+    ):
+        self.model = model
+        self.index_name = index_name
+        self.session_factory = session_factory
+        self.fields = list(fields) if fields else [c.key for c in model.__table__.columns if c.key not in set(exclude)]
+        self.serializer = serializer or self._serialize
+        self.settings = settings
+        self.primary_key = primary_key
+        self.chunk_size = chunk_size or int(os.getenv("SEARCH_SYNC_CHUNK_SIZE", "1000"))
+        self.max_pending_tasks = max_pending_tasks
+        self.task_timeout = task_timeout
+        self.lag = timedelta(seconds=lag if lag is not None else float(os.getenv("SEARCH_SYNC_LAG", "60")))
+        self.service = service or search_service
+        self.watermark_key = f"search_sync:{index_name}:watermark"
+        self.lock_name = f"search_sync:{index_name}"
+        # (token, timeout) while sync()/reindex() holds the lock
+        self._lock: Optional[Tuple[str, float]] = None
+
+    def _serialize(self, row) -> Dict[str, Any]:
+        return {field: _json_safe(getattr(row, field)) for field in self.fields}
+
+    # --- Watermark ---
+    async def get_watermark(self):
+        value = await cache.get_value(self.watermark_key)
+        if not value:
+            return None
+        return datetime.fromisoformat(value["updated_at"]), uuid.UUID(value["id"])
+
+    async def set_watermark(self, watermark):
+        updated_at, row_id = watermark
+        await cache.set_value(self.watermark_key, {"updated_at": updated_at.isoformat(), "id": str(row_id)})
+
+    # --- Reading ---
+    async def _chunks(self, after=None, include_deleted=True):
+        """
+        Yield lists of rows ordered by (updated_at, id), `chunk_size` at a time,
+        up to `lag` before the start of the scan.
+        """
+        model = self.model
+        before = datetime.utcnow() - self.lag
+        while True:
+            stmt = select(model).where(model.updated_at < before).order_by(model.updated_at, model.id).limit(self.chunk_size)
+            if after is not None:
+                stmt = stmt.where(tuple_(model.updated_at, model.id) > tuple_(*after))
+            if not include_deleted:
+                stmt = stmt.where(model.deleted_at.is_(None))
+            async with self.session_factory() as session:
+                rows = (await session.execute(stmt)).scalars().all()
+            if not rows:
+                return
+            yield rows
+            after = (rows[-1].updated_at, rows[-1].id)
+            if len(rows) < self.chunk_size:
+                return
+
+    # --- Writing with backpressure ---
+    async def _await_task(self, task):
+        result = await self.service.wait_for_task(task["taskUid"], timeout=self.task_timeout)
+        if result.get("status") != "succeeded":
+            raise IndexTaskError(f"Meilisearch task {task['taskUid']} on {self.index_name} {result.get('status')}: {result.get('error')}")
+
+    async def _push(self, index_name: str, rows, pending: deque, on_commit=None):
+        upserts, deletes = [], []
+        for row in rows:
+            if row.deleted_at is not None:
+                deletes.append(str(getattr(row, self.primary_key)))
+            else:
+                upserts.append(self.serializer(row))
+
+        tasks = []
+        if upserts:
+            tasks.append(await self.service.add_documents(index_name, upserts, primary_key=self.primary_key))
+        if deletes:
+            tasks.append(await self.service.delete_documents(index_name, deletes))
+        pending.append((tasks, on_commit))
+
+        while len(pending) > self.max_pending_tasks:
+            await self._settle_oldest(pending)
+
+    async def _settle_oldest(self, pending: deque):
+        tasks, on_commit = pending.popleft()
+        for task in tasks:
+            await self._await_task(task)
+        await self._keep_lock()
+        if on_commit is not None:
+            await on_commit()
+
+    async def _settle_all(self, pending: deque):
+        while pending:
+            await self._settle_oldest(pending)
+
+    # --- Locking ---
+    async def _keep_lock(self):
+        """
+        Renew the sync lock for another `lock_timeout`; raises SyncLockLost if it already expired.
+        """
+        if self._lock is None:
+            return
+        token, timeout = self._lock
+        if not await cache.extend_lock(self.lock_name, token, timeout):
+            raise SyncLockLost(f"Sync lock for {self.index_name} expired; another worker may be syncing")
+
+    async def _release_lock(self, token):
+        self._lock = None
+        await cache.release_lock(self.lock_name, token)
+
+    # --- Public API ---
+    async def sync(self, lock_timeout: float = 300.0) -> int:
+        """
+        Push rows changed since the last watermark. Returns the number of rows processed,
+        or -1 if another worker currently holds the sync lock.
+        """
+        token = await cache.acquire_lock(self.lock_name, timeout=lock_timeout)
+        if token is None:
+            return -1
+        self._lock = (token, lock_timeout)
+        try:
+            after = await self.get_watermark()
+            if after is None and self.settings:
+                # First sync into this index
+                await self._await_task(await self.service.update_settings(self.index_name, self.settings))
+            pending, processed = deque(), 0
+            async for rows in self._chunks(after):
+                watermark = (rows[-1].updated_at, rows[-1].id)
+                await self._push(self.index_name, rows, pending, on_commit=lambda w=watermark: self.set_watermark(w))
+                await self._keep_lock()
+                processed += len(rows)
+            await self._settle_all(pending)
+            if processed:
+                logger.info(f"Synced {processed} rows into Meilisearch index {self.index_name}")
+            return processed
+        finally:
+            await self._release_lock(token)
+
+    async def reindex(self, lock_timeout: float = 3600.0) -> int:
+        """
+        Full rebuild into a temporary index, then an atomic swap with the live index.
+        Searches keep hitting the old index until the swap.
+        """
+        token = await cache.acquire_lock(self.lock_name, timeout=lock_timeout)
+        if token is None:
+            raise RuntimeError(f"Sync already running for {self.index_name}")
+        self._lock = (token, lock_timeout)
+        tmp_index = f"{self.index_name}_reindex_{int(time.time())}"
+        try:
+            # The live index must exist for the swap; "already exists" failures are expected
+            await self.service.wait_for_task((await self.service.create_index(self.index_name, self.primary_key))["taskUid"])
+            await self._await_task(await self.service.create_index(tmp_index, self.primary_key))
+            if self.settings:
+                await self._await_task(await self.service.update_settings(tmp_index, self.settings))
+
+            pending, processed, last = deque(), 0, None
+            async for rows in self._chunks(include_deleted=False):
+                await self._push(tmp_index, rows, pending)
+                await self._keep_lock()
+                processed += len(rows)
+                last = (rows[-1].updated_at, rows[-1].id)
+            await self._settle_all(pending)
+            await self._keep_lock()
+
+            await self._await_task(await self.service.swap_indexes([[self.index_name, tmp_index]]))
+            if last is not None:
+                # Rows updated during the scan or within `lag` of it sort after `last` and are picked up by sync()
+                await self.set_watermark(last)
+            logger.info(f"Reindexed {processed} rows into {self.index_name}")
+            return processed
+        finally:
+            try:
+                await self.service.delete_index(tmp_index)
+            except Exception as e:
+                logger.warning(f"Failed to drop temporary index {tmp_index}: {str(e)}")
+            await self._release_lock(token)
+
+    async def run_forever(self, interval: Optional[float] = None):
+        """
+        Background loop for service startup: `asyncio.create_task(indexer.run_forever())`.
+        """
+        interval = interval or float(os.getenv("SEARCH_SYNC_INTERVAL", "10"))
+        while True:
+            try:
+                await self.sync()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Search sync for {self.index_name} failed: {str(e)}")
+            await asyncio.sleep(interval)
@@ -0,0 +1,213 @@
+import os
+import re
+import time
+import asyncio
+import hashlib
+import logging
+from typing import Dict, List, Optional
+from .cache import cache
+from .admission import INTERACTIVE
+from .observability.metrics import get_meter
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+logger = logging.getLogger(__name__)
+meter = get_meter(__name__)
+
+hit_counter = meter.create_counter("ai.semantic_cache.hits", description="Prompts answered from a similar cached prompt")
+miss_counter = meter.create_counter("ai.semantic_cache.misses", description="Prompts with no similar cached prompt")
+saved_histogram = meter.create_histogram(
+    "ai.semantic_cache.latency_saved", unit="s", description="Estimated generation time avoided per semantic hit"
+)
+
+_WHITESPACE = re.compile(r"\s+")
+
+def normalize_prompt(prompt: str) -> str:
+    return _WHITESPACE.sub(" ", prompt).strip().lower()
+
+class _VectorIndex:
+    """
+    Fixed-capacity ring of L2-normalised float32 vectors; cosine similarity is a single matmul.
+    Each slot remembers when its vector was added so entries past the answer TTL never match.
+    """
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self.matrix = None
+        self.added = None
+        self.keys: List[Optional[str]] = []
+        self.positions: Dict[str, int] = {}
+        self.size = 0
+        self.cursor = 0
+
+    def add(self, vector, key: str, added_at: float):
+        if self.matrix is None:
+            self.matrix = np.zeros((self.capacity, vector.shape[0]), dtype=np.float32)
+            self.added = np.zeros(self.capacity, dtype=np.float64)
+            self.keys = [None] * self.capacity
+        if vector.shape[0] != self.matrix.shape[1]:
+            return
+        slot = self.positions.get(key)
+        if slot is None:
+            slot = self.cursor
+            evicted = self.keys[slot]
+            if evicted is not None:
+                del self.positions[evicted]
+            self.cursor = (self.cursor + 1) % self.capacity
+            self.size = min(self.size + 1, self.capacity)
+        self.matrix[slot] = vector
+        self.added[slot] = added_at
+        self.keys[slot] = key
+        self.positions[key] = slot
+
+    def search(self, vector, not_before: float):
+        if not self.size or vector.shape[0] != self.matrix.shape[1]:
+            return None, 0.0
+        scores = self.matrix[:self.size] @ vector
+        scores[self.added[:self.size] < not_before] = -1.0
+        best = int(np.argmax(scores))
+        if self.keys[best] is None:
+            return None, 0.0
+        return self.keys[best], float(scores[best])
+
+    def remove(self, key: str):
+        slot = self.positions.pop(key, None)
+        if slot is not None:
+            self.matrix[slot] = 0
+            self.added[slot] = 0
+            self.keys[slot] = None
+
+class SemanticCache:
+    """
+    Embedding-similarity layer in front of the exact AI response cache.
+    Prompts are embedded through Ollama's embeddings endpoint; a cached answer is reused
+    when cosine similarity reaches `threshold`. Vectors live in an in-process NumPy matrix
+    per (model, system) namespace and are mirrored to Redis so every worker shares them:
+    `ai_semantic:<ns>` holds the vectors and `ai_semantic_log:<ns>` (sorted by add time)
+    lets workers pull only what was added since their last refresh. Both are trimmed to
+    `capacity` entries and to the answer TTL.
+    """
+
+    def __init__(self, service, threshold=None, embed_model=None, capacity=None, refresh_interval=None):
+        self.service = service
+        self.threshold = float(threshold or os.getenv("AI_SEMANTIC_THRESHOLD", "0.95"))
+        self.embed_model = embed_model or os.getenv("AI_EMBED_MODEL", "nomic-embed-text")
+        self.capacity = int(capacity or os.getenv("AI_SEMANTIC_MAX_ENTRIES", "20000"))
+        self.refresh_interval = float(refresh_interval or os.getenv("AI_SEMANTIC_REFRESH_INTERVAL", "30"))
+        self._indexes: Dict[str, _VectorIndex] = {}
+        self._loaded_at: Dict[str, float] = {}
+        # Newest log score seen per namespace; refreshes read from here on
+        self._watermarks: Dict[str, float] = {}
+        self._refreshing: Dict[str, asyncio.Task] = {}
+        # Moving average of real generation time, used to estimate latency saved
+        self._avg_generation = None
+
+    @property
+    def available(self):
+        return np is not None
+
+    @staticmethod
+    def _namespace(model: str, system: Optional[str]) -> str:
+        return hashlib.md5(f"{model}\x00{system or ''}".encode()).hexdigest()[:16]
+
+    def _not_before(self) -> float:
+        # Answers older than cache_ttl are gone from ai_cache, so their vectors are useless
+        return time.time() - self.service.cache_ttl
+
+    async def embed(self, prompt: str):
+        async with self.service.admission.slot(INTERACTIVE):
+            response = await self.service.client.post(
+                "/api/embeddings", json={"model": self.embed_model, "prompt": normalize_prompt(prompt)}
+            )
+        response.raise_for_status()
+        vector = np.asarray(response.json()["embedding"], dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    async def _index(self, namespace: str) -> _VectorIndex:
+        index = self._indexes.get(namespace)
+        if index is None:
+            # First use in this worker: wait for the initial load so lookups can hit
+            index = self._indexes[namespace] = _VectorIndex(self.capacity)
+            self._loaded_at[namespace] = time.monotonic()
+            await self._load(namespace, index)
+        elif time.monotonic() - self._loaded_at.get(namespace, 0) >= self.refresh_interval:
+            # Later refreshes run in the background, off the request path
+            task = self._refreshing.get(namespace)
+            if task is None or task.done():
+                self._loaded_at[namespace] = time.monotonic()
+                self._refreshing[namespace] = asyncio.ensure_future(self._load(namespace, index))
+        return index
+
+    async def _load(self, namespace: str, index: _VectorIndex):
+        """
+        Pull vectors added by other workers since the last refresh.
+        """
+        # Re-read one refresh interval back so slightly skewed worker clocks cannot hide entries
+        since = max(self._watermarks.get(namespace, 0) - self.refresh_interval * 1000, self._not_before() * 1000)
+        client = cache.get_binary_client()
+        try:
+            added = await client.zrangebyscore(f"ai_semantic_log:{namespace}", since, "+inf", withscores=True)
+            added = added[-self.capacity:]
+            keys = [key for key, _ in added]
+            vectors = await client.hmget(f"ai_semantic:{namespace}", keys) if keys else []
+        except Exception as e:
+            logger.warning(f"Semantic cache reload failed: {str(e)}")
+            return
+        for (key, score), raw in zip(added, vectors):
+            key = key.decode() if isinstance(key, bytes) else key
+            if raw is not None and key not in index.positions:
+                index.add(np.frombuffer(raw, dtype=np.float32), key, score / 1000)
+        if added:
+            self._watermarks[namespace] = max(self._watermarks.get(namespace, 0), added[-1][1])
+
+    async def lookup(self, prompt: str, system: Optional[str], model: str):
+        """
+        Returns (answer, vector). `answer` is None on a miss; the vector is reused by add().
+        """
+        namespace = self._namespace(model, system)
+        vector = await self.embed(prompt)
+        index = await self._index(namespace)
+        key, score = index.search(vector, self._not_before())
+        if key is not None and score >= self.threshold:
+            answer = await cache.get_value(key)
+            if answer:
+                hit_counter.add(1, {"model": model})
+                if self._avg_generation is not None:
+                    saved_histogram.record(self._avg_generation, {"model": model})
+                logger.info(f"Serving AI response from semantic cache (similarity {score:.3f})")
+                return answer, vector
+            index.remove(key)
+        miss_counter.add(1, {"model": model})
+        return None, vector
+
+    async def add(self, vector, system: Optional[str], model: str, cache_key: str, generation_time: float):
+        namespace = self._namespace(model, system)
+        index = await self._index(namespace)
+        now = time.time()
+        index.add(vector, cache_key, now)
+        self._avg_generation = generation_time if self._avg_generation is None else (
+            0.9 * self._avg_generation + 0.1 * generation_time
+        )
+        vectors_key = f"ai_semantic:{namespace}"
+        log_key = f"ai_semantic_log:{namespace}"
+        client = cache.get_binary_client()
+        pipe = client.pipeline(transaction=False)
+        pipe.hset(vectors_key, cache_key, vector.astype(np.float32).tobytes())
+        pipe.zadd(log_key, {cache_key: now * 1000})
+        # Answers expire after cache_ttl, so idle namespaces age out with them
+        pipe.expire(vectors_key, self.service.cache_ttl)
+        pipe.expire(log_key, self.service.cache_ttl)
+        # Everything added before the cutoff or beyond capacity (oldest first) is dropped
+        pipe.zrangebyscore(log_key, "-inf", self._not_before() * 1000)
+        pipe.zrange(log_key, 0, -self.capacity - 1)
+        *_, expired, surplus = await pipe.execute()
+        stale = list(dict.fromkeys(expired + surplus))
+        if stale:
+            pipe = client.pipeline(transaction=False)
+            pipe.hdel(vectors_key, *stale)
+            pipe.zrem(log_key, *stale)
+            await pipe.execute()
@@ -1,15 +1,86 @@
 import os
+import re
+import hmac
+import time
+import asyncio
+import hashlib
+import inspect
 import logging
+import weakref
+import functools
+import multiprocessing
 import boto3
+from datetime import datetime, timezone
+from urllib.parse import quote, urlsplit
 from botocore.client import Config
-from typing import Optional, BinaryIO
+from botocore.exceptions import ClientError
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from fastapi import HTTPException, Request, Response
+from fastapi.responses import StreamingResponse
+from typing import Optional, BinaryIO, Dict, Any, Iterable
+from .cache import LocalCache, SingleFlight
+from .observability.metrics import get_meter
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:
+    Image = None
 
 logger = logging.getLogger(__name__)
+meter = get_meter(__name__)
+
+upload_bytes_counter = meter.create_counter("storage.upload.bytes", unit="By", description="Bytes uploaded to object storage")
+upload_duration_histogram = meter.create_histogram("storage.upload.duration", unit="s", description="Upload wall time")
+upload_throughput_histogram = meter.create_histogram(
+    "storage.upload.throughput", unit="By/s", description="Per-upload throughput"
+)
+download_bytes_counter = meter.create_counter("storage.download.bytes", unit="By", description="Bytes streamed through the download proxy")
+download_streams_counter = meter.create_up_down_counter("storage.download.active", description="Open download proxy streams")
+
+# S3 rejects multipart parts smaller than 5 MiB (except the last one)
+MIN_PART_SIZE = 5 * 1024 * 1024
+
+# SigV4 presigned URLs are capped at 7 days
+MAX_PRESIGN_EXPIRY = 7 * 24 * 3600
+
+# Derivative name -> longest edge in pixels
+DEFAULT_IMAGE_VARIANTS = "thumb:160,medium:640,large:1280"
+
+def _parse_variants(spec: str) -> Dict[str, int]:
+    return {name.strip(): int(edge) for name, edge in (item.split(":") for item in spec.split(",") if item.strip())}
+
+def _render_variants(data: bytes, sizes: Dict[str, int], quality: int) -> Dict[str, bytes]:
+    """
+    Decode once and encode a WebP per size. Runs in a worker process, so it must stay
+    a picklable module-level function.
+    """
+    import io
+    image = Image.open(io.BytesIO(data))
+    # JPEG can decode straight at a reduced scale, far cheaper than a full decode + resize
+    largest = max(sizes.values())
+    image.draft("RGB", (largest, largest))
+    image = ImageOps.exif_transpose(image)
+    if image.mode not in ("RGB", "RGBA"):
+        image = image.convert("RGBA" if "transparency" in image.info or image.mode in ("LA", "P") else "RGB")
+    rendered = {}
+    for name, edge in sizes.items():
+        variant = image.copy()
+        variant.thumbnail((edge, edge), Image.LANCZOS)
+        out = io.BytesIO()
+        variant.save(out, "WEBP", quality=quality, method=4)
+        rendered[name] = out.getvalue()
+    return rendered
+
+# Only single byte ranges are proxied; anything else is answered with the full object
+_SINGLE_RANGE = re.compile(r"^bytes=(\d+-\d*|-\d+)$")
 
 class StorageService:
     """
     Standardized S3-compatible storage integration for RootPulse using MinIO.
     Supports global data replication and secure multi-site access.
+    Large uploads are streamed as concurrent multipart parts from a thread pool,
+    keeping at most `concurrency` parts in memory and the event loop unblocked.
+    download_response() proxies objects for clients that cannot reach MinIO directly.
     """
 
     def __init__(self, endpoint=None, access_key=None, secret_key=None, bucket=None):
@@ -17,7 +88,28 @@ class StorageService:
         self.access_key = access_key or os.getenv("S3_ACCESS_KEY", "minioadmin")
         self.secret_key = secret_key or os.getenv("S3_SECRET_KEY", "minioadmin")
         self.bucket = bucket or os.getenv("S3_BUCKET", "rootpulse")
+        self.part_size = max(MIN_PART_SIZE, int(os.getenv("S3_PART_SIZE", str(8 * 1024 * 1024))))
+        self.upload_concurrency = int(os.getenv("S3_UPLOAD_CONCURRENCY", "4"))
+        self.region = os.getenv("S3_REGION", "us-east-1")
+        self.presign_bucket = int(os.getenv("S3_PRESIGN_BUCKET", "300"))
+        self.proxy_chunk_size = int(os.getenv("S3_PROXY_CHUNK_SIZE", str(64 * 1024)))
+        self.proxy_max_streams = int(os.getenv("S3_PROXY_MAX_STREAMS", "32"))
+        self.proxy_queue_timeout = float(os.getenv("S3_PROXY_QUEUE_TIMEOUT", "5"))
+        self._streams = None
+        self._download_executor = None
+        self.image_variants = _parse_variants(os.getenv("S3_IMAGE_VARIANTS", DEFAULT_IMAGE_VARIANTS))
+        self.image_quality = int(os.getenv("S3_IMAGE_QUALITY", "80"))
+        self.image_max_bytes = int(os.getenv("S3_IMAGE_MAX_BYTES", str(25 * 1024 * 1024)))
+        self.image_workers = int(os.getenv("S3_IMAGE_WORKERS", str(max(1, (os.cpu_count() or 2) // 2))))
+        self._image_executor = None
+        self._variant_flight = SingleFlight()
+        self._known_variants = LocalCache(maxsize=10000, ttl=3600)
+        self._background = set()
+        self._url_cache = LocalCache(maxsize=int(os.getenv("S3_PRESIGN_CACHE_SIZE", "10000")), ttl=MAX_PRESIGN_EXPIRY)
+        self._signing_keys = {}
         self._s3 = None
+        self._client = None
+        self._executor = None
 
     @property
     def s3(self):
@@ -33,27 +125,463 @@ class StorageService:
             logger.info(f"Connected to MinIO at {self.endpoint}")
         return self._s3
 
+    @property
+    def client(self):
+        """
+        Low-level boto3 client (thread-safe) with a connection pool sized for the upload pool.
+        """
+        if self._client is None:
+            self._client = boto3.client(
+                's3',
+                endpoint_url=self.endpoint,
+                aws_access_key_id=self.access_key,
+                aws_secret_access_key=self.secret_key,
+                config=Config(
+                    signature_version='s3v4',
+                    max_pool_connections=max(10, self.upload_concurrency * 2),
+                    retries={"max_attempts": 3, "mode": "standard"},
+                ),
+                region_name='us-east-1'
+            )
+        return self._client
+
+    @property
+    def executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.upload_concurrency + 2, thread_name_prefix="storage"
+            )
+        return self._executor
+
+    @property
+    def download_executor(self) -> ThreadPoolExecutor:
+        """
+        Separate pool for proxied downloads, one thread per allowed stream, so slow
+        clients never starve uploads.
+        """
+        if self._download_executor is None:
+            self._download_executor = ThreadPoolExecutor(
+                max_workers=self.proxy_max_streams, thread_name_prefix="storage-download"
+            )
+        return self._download_executor
+
+    async def _run(self, fn, *args, executor=None, **kwargs):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(executor or self.executor, functools.partial(fn, *args, **kwargs))
+
+    @property
+    def image_executor(self) -> ProcessPoolExecutor:
+        """
+        Decoding and resizing are CPU-bound and hold the GIL, so they run in processes.
+        Workers are never forked from the server process: a fork would copy its event loop,
+        running threads and held locks (boto3 pools, OpenTelemetry exporters) mid-state.
+        """
+        if self._image_executor is None:
+            method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+            self._image_executor = ProcessPoolExecutor(
+                max_workers=self.image_workers, mp_context=multiprocessing.get_context(method)
+            )
+        return self._image_executor
+
+    def close(self):
+        for attr in ("_executor", "_download_executor", "_image_executor"):
+            pool = getattr(self, attr)
+            if pool is not None:
+                pool.shutdown(wait=True)
+                setattr(self, attr, None)
+
     def upload_file(self, file_obj: BinaryIO, object_name: str, extra_args: Optional[dict] = None):
         """
         Upload a file object to the MinIO bucket.
+        `extra_args` are passed to put_object (e.g. {"ContentType": "image/png"}).
         """
         try:
-            self.s3.Bucket(self.bucket).put_object(Key=object_name, Body=file_obj, ExtraArgs=extra_args or {})
+            self.client.put_object(Bucket=self.bucket, Key=object_name, Body=file_obj, **(extra_args or {}))
             return True
         except Exception as e:
             logger.error(f"MinIO upload error: {str(e)}")
             return False
 
-    def get_download_url(self, object_name: str, expires_in: int = 3600):
+    async def _read(self, file_obj, size: int) -> bytes:
         """
-        Generate a presigned URL for secure temporary access.
+        Read up to `size` bytes from a FastAPI UploadFile or a plain binary file object.
+        Fills the buffer completely unless the stream is exhausted.
+        """
+        read = file_obj.read
+        chunks, remaining = [], size
+        while remaining > 0:
+            if inspect.iscoroutinefunction(read):
+                chunk = await read(remaining)
+            else:
+                chunk = await self._run(read, remaining)
+            if not chunk:
+                break
+            chunks.append(chunk)
+            remaining -= len(chunk)
+        return b"".join(chunks)
+
+    async def upload_stream(
+        self,
+        file_obj,
+        object_name: str,
+        content_type: Optional[str] = None,
+        extra_args: Optional[dict] = None,
+        part_size: Optional[int] = None,
+        concurrency: Optional[int] = None,
+    ) -> Dict[str, Any]:
+        """
+        Async upload from an UploadFile or binary file object without buffering it whole.
+        Objects smaller than one part use a single PUT; larger ones use multipart upload
+        with up to `concurrency` parts in flight.
+        Returns {"key", "size", "etag", "parts", "duration"}.
+        """
+        part_size = max(MIN_PART_SIZE, part_size or self.part_size)
+        concurrency = concurrency or self.upload_concurrency
+        params = dict(extra_args or {})
+        if content_type:
+            params["ContentType"] = content_type
+        started = time.monotonic()
+
+        first = await self._read(file_obj, part_size)
+        if len(first) < part_size:
+            response = await self._run(
+                self.client.put_object, Bucket=self.bucket, Key=object_name, Body=first, **params
+            )
+            return self._record_upload(object_name, len(first), response.get("ETag"), 1, started)
+
+        upload = await self._run(
+            self.client.create_multipart_upload, Bucket=self.bucket, Key=object_name, **params
+        )
+        upload_id = upload["UploadId"]
+        slots = asyncio.Semaphore(concurrency)
+        tasks, total, part_number, data = [], 0, 1, first
+
+        async def send_part(number, body):
+            try:
+                response = await self._run(
+                    self.client.upload_part,
+                    Bucket=self.bucket, Key=object_name, UploadId=upload_id, PartNumber=number, Body=body,
+                )
+                return {"PartNumber": number, "ETag": response["ETag"]}
+            finally:
+                slots.release()
+
+        try:
+            while data:
+                # Bounded memory: wait for a free slot before reading the next part
+                await slots.acquire()
+                tasks.append(asyncio.ensure_future(send_part(part_number, data)))
+                total += len(data)
+                part_number += 1
+                if any(task.done() and task.exception() for task in tasks):
+                    break
+                data = await self._read(file_obj, part_size)
+
+            parts = await asyncio.gather(*tasks)
+            response = await self._run(
+                self.client.complete_multipart_upload,
+                Bucket=self.bucket, Key=object_name, UploadId=upload_id,
+                MultipartUpload={"Parts": sorted(parts, key=lambda part: part["PartNumber"])},
+            )
+        except BaseException:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            try:
+                await self._run(
+                    self.client.abort_multipart_upload, Bucket=self.bucket, Key=object_name, UploadId=upload_id
+                )
+            except Exception as e:
+                logger.error(f"MinIO abort multipart error for {object_name}: {str(e)}")
+            raise
+        return self._record_upload(object_name, total, response.get("ETag"), len(parts), started)
+
+    def _record_upload(self, object_name, size, etag, parts, started):
+        duration = time.monotonic() - started
+        attrs = {"bucket": self.bucket, "multipart": parts > 1}
+        upload_bytes_counter.add(size, attrs)
+        upload_duration_histogram.record(duration, attrs)
+        if duration > 0:
+            upload_throughput_histogram.record(size / duration, attrs)
+        return {"key": object_name, "size": size, "etag": etag, "parts": parts, "duration": duration}
+
+    # --- Image derivatives ---
+    @staticmethod
+    def variant_key(object_name: str, variant: str) -> str:
+        """
+        Derivatives live next to the original: photos/a.jpg -> photos/a.jpg.thumb.webp
+        """
+        return f"{object_name}.{variant}.webp"
+
+    async def create_variants(self, object_name: str, data: Optional[bytes] = None, variants=None) -> Dict[str, str]:
+        """
+        Render resized WebP variants of an image and store them next to the original.
+        Reads the original from storage unless `data` is given. Returns {variant: key}.
+        """
+        if Image is None:
+            raise RuntimeError("Pillow is required for image variants (pip install rootpulse-core[images])")
+        sizes = {name: self.image_variants[name] for name in (variants or self.image_variants)}
+        if data is None:
+            original = await self._run(self.client.get_object, Bucket=self.bucket, Key=object_name)
+            if original["ContentLength"] > self.image_max_bytes:
+                original["Body"].close()
+                raise ValueError(f"{object_name} is too large for image variants ({original['ContentLength']} bytes)")
+            data = await self._run(original["Body"].read)
+
+        loop = asyncio.get_running_loop()
+        rendered = await loop.run_in_executor(
+            self.image_executor, _render_variants, data, sizes, self.image_quality
+        )
+        keys = {}
+        for name, body in rendered.items():
+            key = self.variant_key(object_name, name)
+            await self._run(
+                self.client.put_object, Bucket=self.bucket, Key=key, Body=body,
+                ContentType="image/webp", CacheControl="public, max-age=31536000, immutable",
+            )
+            self._known_variants.set(key, True)
+            keys[name] = key
+        logger.info(f"Created {len(keys)} image variants for {object_name}")
+        return keys
+
+    async def upload_image(self, file_obj, object_name: str, content_type: Optional[str] = None, wait: bool = False):
+        """
+        upload_stream() followed by variant generation; in the background unless `wait`.
+        """
+        result = await self.upload_stream(file_obj, object_name, content_type=content_type)
+        if wait:
+            result["variants"] = await self.create_variants(object_name)
+            return result
+
+        task = asyncio.ensure_future(self.create_variants(object_name))
+        self._background.add(task)
+        task.add_done_callback(self._variant_done)
+        return result
+
+    def _variant_done(self, task):
+        self._background.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            logger.error(f"Image variant generation failed: {str(task.exception())}")
+
+    async def ensure_variant(self, object_name: str, variant: str) -> str:
+        """
+        Lazy path: return the key of a variant, rendering all variants on first request.
+        Concurrent requests for the same original share one render.
+        """
+        if variant not in self.image_variants:
+            raise ValueError(f"Unknown image variant: {variant}")
+        key = self.variant_key(object_name, variant)
+        if self._known_variants.get(key, None):
+            return key
+        try:
+            await self._run(self.client.head_object, Bucket=self.bucket, Key=key)
+        except ClientError as e:
+            if e.response.get("ResponseMetadata", {}).get("HTTPStatusCode") != 404:
+                raise
+            await self._variant_flight.do(object_name, lambda: self.create_variants(object_name))
+        self._known_variants.set(key, True)
+        return key
+
+    # --- Download proxy ---
+    async def _get_object(self, object_name: str, **params):
+        return await self._run(
+            self.client.get_object, Bucket=self.bucket, Key=object_name, executor=self.download_executor, **params
+        )
+
+    async def _open_download(self, object_name: str, range_header, if_none_match, if_range):
+        """
+        One GET to S3 with the client's conditions passed through.
+        Returns the get_object response, or a bare Response for 304/416.
         """
+        params = {}
+        if if_none_match:
+            params["IfNoneMatch"] = if_none_match
+        if range_header and _SINGLE_RANGE.match(range_header):
+            params["Range"] = range_header
+            if if_range:
+                # If-Range: serve the range only if the object is unchanged, else the whole object
+                params["IfMatch"] = if_range
         try:
-            return self.s3.meta.client.generate_presigned_url(
-                'get_object',
-                Params={'Bucket': self.bucket, 'Key': object_name},
-                ExpiresIn=expires_in
+            return await self._get_object(object_name, **params)
+        except ClientError as e:
+            status = e.response.get("ResponseMetadata", {}).get("HTTPStatusCode")
+            code = e.response.get("Error", {}).get("Code")
+            if status == 304:
+                return Response(status_code=304, headers={} if "," in if_none_match else {"ETag": if_none_match})
+            if status == 412 and "IfMatch" in params:
+                params.pop("Range")
+                params.pop("IfMatch")
+                return await self._get_object(object_name, **params)
+            if status == 416:
+                head = await self._run(
+                    self.client.head_object, Bucket=self.bucket, Key=object_name, executor=self.download_executor
+                )
+                return Response(status_code=416, headers={"Content-Range": f"bytes */{head['ContentLength']}"})
+            if status == 404 or code in ("NoSuchKey", "NotFound"):
+                raise HTTPException(status_code=404, detail="File not found")
+            raise
+
+    async def download_response(
+        self, request: Request, object_name: str, cache_control: Optional[str] = None
+    ) -> Response:
+        """
+        Stream an object to the client through this service. Honours Range (single byte
+        ranges), If-Range and If-None-Match, and reads `S3_PROXY_CHUNK_SIZE` bytes at a
+        time, so memory stays flat regardless of object size. At most
+        `S3_PROXY_MAX_STREAMS` downloads run per worker; extra requests wait up to
+        `S3_PROXY_QUEUE_TIMEOUT` and then get 503 + Retry-After.
+
+        Usage:
+            @router.get("/files/{key:path}")
+            async def download(key: str, request: Request):
+                return await storage_service.download_response(request, key)
+        """
+        if self._streams is None:
+            self._streams = asyncio.Semaphore(self.proxy_max_streams)
+        try:
+            await asyncio.wait_for(self._streams.acquire(), timeout=self.proxy_queue_timeout)
+        except asyncio.TimeoutError:
+            raise HTTPException(status_code=503, detail="Too many downloads in progress", headers={"Retry-After": "1"})
+
+        try:
+            result = await self._open_download(
+                object_name,
+                request.headers.get("range"),
+                request.headers.get("if-none-match"),
+                request.headers.get("if-range"),
             )
+        except BaseException:
+            self._streams.release()
+            raise
+        if isinstance(result, Response):
+            self._streams.release()
+            return result
+
+        body = result["Body"]
+        headers = {"Accept-Ranges": "bytes", "Content-Length": str(result["ContentLength"])}
+        if result.get("ETag"):
+            headers["ETag"] = result["ETag"]
+        if result.get("LastModified"):
+            headers["Last-Modified"] = result["LastModified"].strftime("%a, %d %b %Y %H:%M:%S GMT")
+        if result.get("ContentRange"):
+            headers["Content-Range"] = result["ContentRange"]
+        if cache_control:
+            headers["Cache-Control"] = cache_control
+
+        released = False
+
+        def release():
+            nonlocal released
+            if not released:
+                released = True
+                body.close()
+                self._streams.release()
+
+        async def chunks():
+            download_streams_counter.add(1)
+            try:
+                while True:
+                    chunk = await self._run(body.read, self.proxy_chunk_size, executor=self.download_executor)
+                    if not chunk:
+                        break
+                    download_bytes_counter.add(len(chunk))
+                    yield chunk
+            finally:
+                download_streams_counter.add(-1)
+                release()
+
+        stream = chunks()
+        # The client may disconnect before the body is ever iterated; free the slot on GC then
+        weakref.finalize(stream, release)
+        return StreamingResponse(
+            stream,
+            status_code=206 if result.get("ContentRange") else 200,
+            media_type=result.get("ContentType") or "application/octet-stream",
+            headers=headers,
+        )
+
+    # --- Presigned URLs ---
+    def _signing_key(self, date_stamp: str) -> bytes:
+        key = self._signing_keys.get(date_stamp)
+        if key is None:
+            key = f"AWS4{self.secret_key}".encode()
+            for part in (date_stamp, self.region, "s3", "aws4_request"):
+                key = hmac.new(key, part.encode(), hashlib.sha256).digest()
+            # Only today's (and around midnight, yesterday's) key is ever needed
+            self._signing_keys = {date_stamp: key}
+        return key
+
+    def _presign(self, host: str, path: str, signed_at: int, expires: int, method: str = "GET") -> str:
+        """
+        SigV4 query-string signature computed locally, no botocore request pipeline.
+        Returns the query string (including X-Amz-Signature) for `path` on `host`.
+        """
+        moment = datetime.fromtimestamp(signed_at, tz=timezone.utc)
+        amz_date = moment.strftime("%Y%m%dT%H%M%SZ")
+        date_stamp = amz_date[:8]
+        scope = f"{date_stamp}/{self.region}/s3/aws4_request"
+        query = (
+            "X-Amz-Algorithm=AWS4-HMAC-SHA256"
+            f"&X-Amz-Credential={quote(f'{self.access_key}/{scope}', safe='-_.~')}"
+            f"&X-Amz-Date={amz_date}"
+            f"&X-Amz-Expires={expires}"
+            "&X-Amz-SignedHeaders=host"
+        )
+        canonical_request = f"{method}\n{path}\n{query}\nhost:{host}\n\nhost\nUNSIGNED-PAYLOAD"
+        string_to_sign = (
+            f"AWS4-HMAC-SHA256\n{amz_date}\n{scope}\n"
+            f"{hashlib.sha256(canonical_request.encode()).hexdigest()}"
+        )
+        signature = hmac.new(self._signing_key(date_stamp), string_to_sign.encode(), hashlib.sha256).hexdigest()
+        return f"{query}&X-Amz-Signature={signature}"
+
+    def _endpoint_parts(self):
+        parts = urlsplit(self.endpoint)
+        host = parts.netloc
+        # Default ports are not part of the signed Host header
+        if (parts.scheme, parts.port) in (("http", 80), ("https", 443)):
+            host = parts.hostname
+        return f"{parts.scheme}://{parts.netloc}", host, parts.path.rstrip("/")
+
+    def get_download_urls(
+        self, object_names: Iterable[str], expires_in: int = 3600, bucket_seconds: Optional[int] = None
+    ) -> Dict[str, str]:
+        """
+        Presign GET URLs for many objects at once, signed locally and cached in-process.
+        Signing times are rounded down to `bucket_seconds` (S3_PRESIGN_BUCKET), so every
+        worker hands out the same URL for an object within a bucket and CDN/browser caches
+        keep hitting. URLs are signed for `expires_in + bucket_seconds`, so each one
+        returned is still valid for at least `expires_in`; the cached URL is reused until
+        the next bucket starts, `expires_in` before it expires.
+        """
+        bucket_seconds = self.presign_bucket if bucket_seconds is None else bucket_seconds
+        now = time.time()
+        if bucket_seconds > 0:
+            signed_at = int(now // bucket_seconds * bucket_seconds)
+            expires = min(expires_in + bucket_seconds, MAX_PRESIGN_EXPIRY)
+            reuse_for = min(signed_at + expires - expires_in - now, signed_at + bucket_seconds - now)
+        else:
+            signed_at, expires, reuse_for = int(now), min(expires_in, MAX_PRESIGN_EXPIRY), 0
+
+        base, host, prefix = self._endpoint_parts()
+        urls = {}
+        for object_name in object_names:
+            cache_key = (object_name, expires_in, bucket_seconds)
+            url = self._url_cache.get(cache_key, None)
+            if url is None:
+                path = f"{prefix}/{self.bucket}/{quote(object_name, safe='/~')}"
+                url = f"{base}{path}?{self._presign(host, path, signed_at, expires)}"
+                if reuse_for > 0:
+                    self._url_cache.set(cache_key, url, ttl=reuse_for)
+            urls[object_name] = url
+        return urls
+
+    def get_download_url(self, object_name: str, expires_in: int = 3600, bucket_seconds: Optional[int] = None):
+        """
+        Generate a presigned URL for secure temporary access.
+        """
+        try:
+            return self.get_download_urls([object_name], expires_in, bucket_seconds)[object_name]
         except Exception as e:
             logger.error(f"MinIO presigned URL error: {str(e)}")
             return None
@@ -0,0 +1,260 @@
+import os
+import time
+import socket
+import asyncio
+import logging
+from typing import Awaitable, Callable, Dict, List, Optional, Sequence, Set, Tuple, Union
+from opentelemetry.metrics import Observation
+from redis.exceptions import ResponseError
+from .cache import cache
+from .observability.metrics import get_meter
+
+logger = logging.getLogger(__name__)
+meter = get_meter(__name__)
+
+processed_counter = meter.create_counter("streams.processed", description="Stream entries handled and acked")
+failed_counter = meter.create_counter("streams.failed", description="Stream handler failures (entry left pending)")
+dead_letter_counter = meter.create_counter("streams.dead_lettered", description="Entries moved to a dead-letter stream")
+handle_histogram = meter.create_histogram("streams.handle_time", unit="s", description="Handler execution time")
+
+# Latest lag/pending per (stream, group), exported through observable gauges
+_group_stats: Dict[tuple, Dict[str, int]] = {}
+
+def _observe(field):
+    def callback(options):
+        return [
+            Observation(stats.get(field, 0), {"stream": stream, "group": group})
+            for (stream, group), stats in list(_group_stats.items())
+        ]
+    return callback
+
+meter.create_observable_gauge("streams.lag", callbacks=[_observe("lag")], description="Entries not yet delivered to the group")
+meter.create_observable_gauge("streams.pending", callbacks=[_observe("pending")], description="Entries delivered but not acked")
+
+Handler = Callable[[str, Dict[str, str]], Awaitable[None]]
+
+class StreamWorker:
+    """
+    Consumer-group worker runtime on top of Redis Streams.
+    - Batched XREADGROUP, never reading more than there are free handler slots
+    - Optional priority lanes: pass several streams, earlier ones are drained first
+    - Bounded handler concurrency, XACK on success
+    - XAUTOCLAIM of entries left idle by crashed/slow consumers; entries still being
+      handled here are skipped and their idle time is reset (XCLAIM JUSTID) every claim pass
+    - Per-lane dead-letter stream (`<stream>:dlq`) once an entry has been delivered `max_deliveries` times
+    - Lag/pending gauges per stream and group
+
+    Usage:
+        async def handle(message_id, data): ...
+        worker = StreamWorker("ai:batch", "ai-workers", handle, concurrency=4)
+        await worker.run()
+    """
+
+    def __init__(
+        self,
+        stream: Union[str, Sequence[str]],
+        group: str,
+        handler: Handler,
+        consumer: Optional[str] = None,
+        batch_size: int = 10,
+        concurrency: int = 10,
+        block_ms: int = 5000,
+        claim_idle_ms: int = 60000,
+        claim_interval: float = 30,
+        max_deliveries: int = 5,
+        dead_letter_stream: Optional[str] = None,
+        redis=None,
+    ):
+        self.streams = [stream] if isinstance(stream, str) else list(stream)
+        self.stream = self.streams[0]
+        self.group = group
+        self.handler = handler
+        self.consumer = consumer or f"{socket.gethostname()}-{os.getpid()}"
+        self.batch_size = batch_size
+        self.concurrency = concurrency
+        self.block_ms = block_ms
+        self.claim_idle_ms = claim_idle_ms
+        self.claim_interval = claim_interval
+        self.max_deliveries = max_deliveries
+        # None: each lane dead-letters into its own `<stream>:dlq`
+        self.dead_letter_stream = dead_letter_stream
+        self.redis = redis or cache
+        self._tasks = set()
+        # (stream, message_id) of entries with a running handler in this process
+        self._in_flight: Set[Tuple[str, str]] = set()
+        self._stopping = asyncio.Event()
+        self._last_claim = 0.0
+
+    @property
+    def client(self):
+        return self.redis.get_client()
+
+    async def ensure_group(self):
+        for stream in self.streams:
+            try:
+                await self.client.xgroup_create(stream, self.group, id="0", mkstream=True)
+                logger.info(f"Created consumer group {self.group} on {stream}")
+            except ResponseError as e:
+                if "BUSYGROUP" not in str(e):
+                    raise
+
+    # --- Main loop ---
+    async def run(self):
+        await self.ensure_group()
+        logger.info(f"StreamWorker {self.consumer} consuming {','.join(self.streams)}/{self.group}")
+        while not self._stopping.is_set():
+            try:
+                if time.monotonic() - self._last_claim >= self.claim_interval:
+                    self._last_claim = time.monotonic()
+                    await self.touch_in_flight()
+                    await self.reclaim()
+                    await self.refresh_stats()
+
+                free = await self._wait_for_slot()
+                if self._stopping.is_set():
+                    break
+                response = await self._read(min(self.batch_size, free))
+                for stream, entries in response or []:
+                    for message_id, fields in entries:
+                        self._spawn(stream, message_id, fields)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"StreamWorker {','.join(self.streams)}/{self.group} loop error: {str(e)}")
+                await asyncio.sleep(1)
+        await self._drain()
+
+    async def _read(self, count):
+        if len(self.streams) > 1:
+            # Strict priority: poll lanes in order without blocking
+            for stream in self.streams:
+                response = await self.client.xreadgroup(
+                    groupname=self.group, consumername=self.consumer,
+                    streams={stream: ">"}, count=count, block=None,
+                )
+                if response:
+                    return response
+        return await self.client.xreadgroup(
+            groupname=self.group,
+            consumername=self.consumer,
+            streams={stream: ">" for stream in self.streams},
+            count=count,
+            block=self.block_ms,
+        )
+
+    def stop(self):
+        self._stopping.set()
+
+    async def _wait_for_slot(self):
+        while len(self._tasks) >= self.concurrency:
+            await asyncio.wait(self._tasks, return_when=asyncio.FIRST_COMPLETED)
+        return self.concurrency - len(self._tasks)
+
+    async def _drain(self):
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    def _spawn(self, stream, message_id, fields):
+        entry = (stream, message_id)
+        self._in_flight.add(entry)
+        task = asyncio.ensure_future(self._handle(stream, message_id, fields))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        task.add_done_callback(lambda _: self._in_flight.discard(entry))
+
+    async def _handle(self, stream, message_id, fields):
+        attrs = {"stream": stream, "group": self.group}
+        started = time.monotonic()
+        try:
+            await self.handler(message_id, fields)
+        except Exception as e:
+            # Left in the PEL; retried via XAUTOCLAIM once idle for claim_idle_ms
+            failed_counter.add(1, attrs)
+            logger.error(f"Stream handler failed for {stream}/{message_id}: {str(e)}")
+            return
+        finally:
+            handle_histogram.record(time.monotonic() - started, attrs)
+        await self.client.xack(stream, self.group, message_id)
+        processed_counter.add(1, attrs)
+
+    # --- Recovery ---
+    async def touch_in_flight(self):
+        """
+        Reset the idle time of entries still being handled here so no consumer,
+        this one included, reclaims them as abandoned.
+        """
+        by_stream: Dict[str, List[str]] = {}
+        for stream, message_id in list(self._in_flight):
+            by_stream.setdefault(stream, []).append(message_id)
+        for stream, message_ids in by_stream.items():
+            try:
+                await self.client.xclaim(
+                    stream, self.group, self.consumer, min_idle_time=0, message_ids=message_ids, justid=True,
+                )
+            except Exception as e:
+                logger.warning(f"Unable to refresh in-flight entries on {stream}: {str(e)}")
+
+    async def reclaim(self):
+        """
+        Take over entries idle longer than claim_idle_ms, dead-lettering those
+        that already exhausted max_deliveries.
+        """
+        for stream in self.streams:
+            start_id = "0-0"
+            while not self._stopping.is_set():
+                free = await self._wait_for_slot()
+                result = await self.client.xautoclaim(
+                    stream, self.group, self.consumer,
+                    min_idle_time=self.claim_idle_ms, start_id=start_id, count=free,
+                )
+                start_id, entries = result[0], result[1]
+                entries = [
+                    (message_id, fields) for message_id, fields in entries
+                    if fields is not None and (stream, message_id) not in self._in_flight
+                ]
+                if entries:
+                    deliveries = await self._delivery_counts(stream, [message_id for message_id, _ in entries])
+                    for message_id, fields in entries:
+                        if deliveries.get(message_id, 0) > self.max_deliveries:
+                            await self.dead_letter(stream, message_id, fields, deliveries[message_id])
+                        else:
+                            self._spawn(stream, message_id, fields)
+                if start_id in ("0-0", b"0-0"):
+                    break
+
+    async def _delivery_counts(self, stream, message_ids):
+        pending = await self.client.xpending_range(
+            stream, self.group, min=message_ids[0], max=message_ids[-1], count=len(message_ids) * 2,
+        )
+        return {item["message_id"]: item["times_delivered"] for item in pending}
+
+    def dead_letter_stream_for(self, stream: str) -> str:
+        return self.dead_letter_stream or f"{stream}:dlq"
+
+    async def dead_letter(self, stream, message_id, fields, deliveries):
+        payload = dict(fields)
+        payload.update({
+            "_source_stream": stream,
+            "_source_id": message_id,
+            "_group": self.group,
+            "_deliveries": str(deliveries),
+        })
+        await self.client.xadd(self.dead_letter_stream_for(stream), payload, maxlen=100000, approximate=True)
+        await self.client.xack(stream, self.group, message_id)
+        dead_letter_counter.add(1, {"stream": stream, "group": self.group})
+        logger.warning(f"Dead-lettered {stream}/{message_id} after {deliveries} deliveries")
+
+    # --- Metrics ---
+    async def refresh_stats(self):
+        for stream in self.streams:
+            try:
+                groups = await self.client.xinfo_groups(stream)
+            except Exception as e:
+                logger.warning(f"Unable to read stream group info for {stream}: {str(e)}")
+                continue
+            for info in groups:
+                if info.get("name") == self.group:
+                    _group_stats[(stream, self.group)] = {
+                        "lag": info.get("lag") or 0,
+                        "pending": info.get("pending") or 0,
+                    }
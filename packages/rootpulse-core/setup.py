@@ -11,14 +11,19 @@ setup(
         "pydantic-settings>=2.1.0",
         "sqlalchemy>=2.0.25",
         "asyncpg>=0.29.0",
-        "pika>=1.3.1",  # RabbitMQ
+        "aio-pika>=9.4.0",  # RabbitMQ
+        "httpx>=0.26.0",  # Meilisearch and Ollama REST clients
         "redis>=5.0.1",
-        "meilisearch>=0.28.1",
         "boto3>=1.34.34",
         "python-jose[cryptography]>=3.3.0",
         "passlib[bcrypt]>=1.7.4",
         "python-dotenv>=1.0.0",
     ],
+    extras_require={
+        "codec": ["orjson>=3.9.10", "msgpack>=1.0.7", "zstandard>=0.22.0", "lz4>=4.3.2"],
+        "semantic": ["numpy>=1.26.0"],
+        "images": ["Pillow>=10.2.0"],
+    },
     description="Shared core library for RootPulse Microservices (FastAPI Version)",
     include_package_data=True,
     package_data={
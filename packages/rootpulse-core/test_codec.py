@@ -0,0 +1,63 @@
+import json
+import pytest
+from rootpulse_core import codec as codec_module
+from rootpulse_core.codec import Codec, COMPRESSIONS, SERIALIZERS, _MAX_HEADER, _header
+
+def test_header_records_format():
+    codec = Codec(serializer="json", compression="none")
+    data = codec.dumps({"a": 1})
+    serializer = "json" if codec_module.orjson is not None else "stdjson"
+    assert data[0] == (COMPRESSIONS["none"] << 2) | SERIALIZERS[serializer]
+    assert codec.loads(data) == {"a": 1}
+
+def test_headers_never_look_like_json_text():
+    for serializer in SERIALIZERS:
+        for compression in COMPRESSIONS:
+            assert _header(serializer, compression)[0] <= _MAX_HEADER
+
+def test_legacy_json_entries_stay_readable():
+    codec = Codec()
+    assert codec.loads(json.dumps({"user": "u1", "roles": ["admin"]})) == {"user": "u1", "roles": ["admin"]}
+    assert codec.loads(b'"plain string"') == "plain string"
+    assert codec.loads(b"[1, 2]") == [1, 2]
+    assert codec.loads(None) is None
+    assert codec.loads(b"") is None
+
+def test_compression_threshold():
+    pytest.importorskip("zstandard")
+    codec = Codec(serializer="json", compression="zstd", threshold=1024)
+    small = codec.dumps({"a": "x" * 10})
+    assert small[0] >> 2 == COMPRESSIONS["none"]
+    large_value = {"a": "x" * 4096}
+    large = codec.dumps(large_value)
+    assert large[0] >> 2 == COMPRESSIONS["zstd"]
+    assert len(large) < 4096
+    assert codec.loads(large) == large_value
+
+def test_int_keys_and_big_integers():
+    codec = Codec(serializer="json", compression="none")
+    assert codec.loads(codec.dumps({1: "one"})) == {"1": "one"}
+    # Not representable as a float: must survive exactly, not as 1.18e+21
+    data = codec.dumps({"id": 2 ** 70 + 1})
+    assert data[0] & 0x03 == SERIALIZERS["stdjson"]
+    assert codec.loads(data) == {"id": 2 ** 70 + 1}
+
+def test_headerless_encode_rejects_big_integers():
+    pytest.importorskip("orjson")
+    with pytest.raises(ValueError):
+        Codec(serializer="json", compression="none").encode({"id": 2 ** 70 + 1})
+
+def test_msgpack_round_trip():
+    pytest.importorskip("msgpack")
+    codec = Codec(serializer="msgpack", compression="none")
+    data = codec.dumps({1: "one", "nested": {2: [3]}})
+    assert data[0] & 0x03 == SERIALIZERS["msgpack"]
+    assert codec.loads(data) == {1: "one", "nested": {2: [3]}}
+    assert codec.decode(codec.encode({1: "one"})[0], "msgpack") == {1: "one"}
+
+def test_msgpack_big_integers_fall_back_to_json():
+    pytest.importorskip("msgpack")
+    codec = Codec(serializer="msgpack", compression="none")
+    data = codec.dumps({"id": 2 ** 70 + 1})
+    assert data[0] & 0x03 == SERIALIZERS["stdjson"]
+    assert codec.loads(data) == {"id": 2 ** 70 + 1}
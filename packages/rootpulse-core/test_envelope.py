@@ -0,0 +1,17 @@
+import json
+from rootpulse_core.bus.envelope import EventEnvelope
+
+def test_large_events_stay_plain_json_by_default(monkeypatch):
+    for name in ("RABBITMQ_CODEC", "RABBITMQ_COMPRESSION", "RABBITMQ_COMPRESSION_THRESHOLD"):
+        monkeypatch.delenv(name, raising=False)
+    envelope = EventEnvelope()
+    event = envelope.build("user.registered", {"bio": "x" * 64 * 1024})
+    body, content_type, content_encoding = envelope.encode(event)
+    assert content_type == "application/json"
+    assert content_encoding is None
+    assert json.loads(body)["data"]["bio"] == "x" * 64 * 1024
+
+def test_unknown_content_encoding_is_identity():
+    envelope = EventEnvelope()
+    event = envelope.decode(b'{"v": 2, "id": "e1", "event_type": "a", "data": {}}', "application/json", "utf-8")
+    assert event["id"] == "e1"
@@ -0,0 +1,36 @@
+from types import SimpleNamespace
+from rootpulse_core import ratelimit
+from rootpulse_core.ratelimit import client_ip
+
+def make_request(headers, peer="10.0.0.5"):
+    return SimpleNamespace(headers={k.lower(): v for k, v in headers.items()}, client=SimpleNamespace(host=peer))
+
+def test_spoofed_forwarded_for_is_ignored(monkeypatch):
+    monkeypatch.setattr(ratelimit, "TRUSTED_PROXY_HOPS", 1)
+    monkeypatch.setattr(ratelimit, "REAL_IP_HEADER", "")
+    # Kong appends the real peer to whatever the client sent
+    first = make_request({"X-Forwarded-For": "1.1.1.1, 203.0.113.7"})
+    second = make_request({"X-Forwarded-For": "2.2.2.2, 203.0.113.7"})
+    assert client_ip(first) == client_ip(second) == "203.0.113.7"
+
+def test_multiple_trusted_hops(monkeypatch):
+    monkeypatch.setattr(ratelimit, "TRUSTED_PROXY_HOPS", 2)
+    monkeypatch.setattr(ratelimit, "REAL_IP_HEADER", "")
+    request = make_request({"X-Forwarded-For": "9.9.9.9, 203.0.113.7, 10.0.0.2"})
+    assert client_ip(request) == "203.0.113.7"
+
+def test_short_chain_falls_back_to_peer(monkeypatch):
+    monkeypatch.setattr(ratelimit, "TRUSTED_PROXY_HOPS", 2)
+    monkeypatch.setattr(ratelimit, "REAL_IP_HEADER", "")
+    assert client_ip(make_request({"X-Forwarded-For": "9.9.9.9"})) == "10.0.0.5"
+
+def test_without_trusted_proxies_uses_peer(monkeypatch):
+    monkeypatch.setattr(ratelimit, "TRUSTED_PROXY_HOPS", 0)
+    monkeypatch.setattr(ratelimit, "REAL_IP_HEADER", "")
+    assert client_ip(make_request({"X-Forwarded-For": "9.9.9.9"})) == "10.0.0.5"
+
+def test_real_ip_header_preferred(monkeypatch):
+    monkeypatch.setattr(ratelimit, "TRUSTED_PROXY_HOPS", 1)
+    monkeypatch.setattr(ratelimit, "REAL_IP_HEADER", "x-real-ip")
+    request = make_request({"X-Real-IP": "203.0.113.7", "X-Forwarded-For": "1.1.1.1, 198.51.100.1"})
+    assert client_ip(request) == "203.0.113.7"
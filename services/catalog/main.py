@@ -1,4 +1,5 @@
 import os
+import asyncio
 from fastapi import FastAPI, Depends
 from sqlalchemy.ext.asyncio import AsyncSession
 from .database import get_db
@@ -10,6 +11,12 @@ app = FastAPI(
     root_path=os.getenv("ROOT_PATH", "")
 )
 
+@app.on_event("startup")
+async def on_startup():
+    if os.getenv("SEARCH_SYNC_ENABLED", "false").lower() == "true":
+        from .search_index import product_indexer
+        app.state.search_sync_task = asyncio.create_task(product_indexer.run_forever())
+
 @app.get("/health")
 async def health_check():
     return {"status": "healthy", "service": "catalog-service"}
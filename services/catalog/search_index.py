@@ -0,0 +1,15 @@
+from rootpulse_core.search_sync import SearchIndexer
+from .database import AsyncSessionLocal
+from .models import Product
+
+product_indexer = SearchIndexer(
+    Product,
+    "products",
+    AsyncSessionLocal,
+    fields=["id", "name", "slug", "description", "price", "sku", "is_active", "updated_at"],
+    settings={
+        "searchableAttributes": ["name", "sku", "description"],
+        "filterableAttributes": ["is_active", "price"],
+        "sortableAttributes": ["price", "updated_at"],
+    },
+)
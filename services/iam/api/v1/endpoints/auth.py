@@ -3,10 +3,14 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from ....database import get_db
 from ....schemas import UserCreate, UserLogin, Token
 from ....services.auth_service import AuthService
+from rootpulse_core.ratelimit import rate_limit
 
 router = APIRouter()
 
-@router.post("/login", response_model=Token, tags=["Auth"])
+# bcrypt verification is deliberately slow; cap attempts per client across all pods
+login_rate_limit = rate_limit(limit=10, period=60, key_by=("ip",), scope="iam-login")
+
+@router.post("/login", response_model=Token, tags=["Auth"], dependencies=[Depends(login_rate_limit)])
 async def login(login_in: UserLogin, db: AsyncSession = Depends(get_db)):
     """
     Authenticate a user and return access/refresh tokens.
@@ -3,6 +3,7 @@ from fastapi.middleware.cors import CORSMiddleware
 from fastapi.exceptions import RequestValidationError
 from fastapi.responses import JSONResponse
 import os
+import asyncio
 from dotenv import load_dotenv
 
 from .api.v1.api import api_router
@@ -40,6 +41,14 @@ async def on_startup():
     print("Initializing database tables...")
     await init_db()
     print("Database tables initialized.")
+    if os.getenv("SEARCH_SYNC_ENABLED", "false").lower() == "true":
+        from .search_index import user_indexer
+        app.state.search_sync_task = asyncio.create_task(user_indexer.run_forever())
+    from rootpulse_core import outbox
+    if outbox.RELAY_ENABLED:
+        # Same flag that makes add_event() stage rows (OUTBOX_RELAY_ENABLED, default false)
+        from .database import AsyncSessionLocal
+        app.state.outbox_relay_task = asyncio.create_task(outbox.OutboxRelay(AsyncSessionLocal).run_forever())
 
 # --- Exception Handlers ---
 @app.exception_handler(HTTPException)
@@ -51,6 +60,7 @@ async def http_exception_handler(request, exc):
             "message": exc.detail,
             "code": "HTTP_ERROR"
         },
+        headers=getattr(exc, "headers", None),
     )
 
 @app.exception_handler(RequestValidationError)
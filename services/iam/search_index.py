@@ -0,0 +1,16 @@
+from rootpulse_core.search_sync import SearchIndexer
+from .database import AsyncSessionLocal
+from .models import User
+
+# Only non-sensitive identity fields are indexed
+user_indexer = SearchIndexer(
+    User,
+    "users",
+    AsyncSessionLocal,
+    fields=["id", "username", "email", "phone", "is_active", "is_staff", "is_banned", "created_at", "updated_at"],
+    settings={
+        "searchableAttributes": ["username", "email", "phone"],
+        "filterableAttributes": ["is_active", "is_staff", "is_banned"],
+        "sortableAttributes": ["created_at"],
+    },
+)
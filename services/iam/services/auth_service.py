@@ -11,6 +11,7 @@ from ..models import User, UserProfile
 from ..schemas import UserCreate, UserLogin
 from rootpulse_core.cache import cache
 from rootpulse_core.email import send_verification_email
+from rootpulse_core.outbox import add_event
 from rootpulse_core.auth import auth_service as core_auth_service
 
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
@@ -118,8 +119,16 @@ class AuthService:
         
         # 4. Handle OTP
         otp = ''.join(random.choices(string.digits, k=6))
-        redis = await cache.get_client()
+        redis = cache.get_client()
         await redis.setex(f"verify_email:{user_in.email}", 600, f"{otp}:{new_user.id}")
+
+        # Published by the outbox relay once this transaction commits (only staged with OUTBOX_RELAY_ENABLED=true)
+        add_event(db, "iam", "user.registered", "user.registered", {
+            "user_id": str(new_user.id),
+            "username": username,
+            "email": user_in.email,
+            "is_guest": is_guest,
+        })
         
         await db.commit()
         await db.refresh(new_user)
@@ -142,7 +151,7 @@ class AuthService:
 
     @staticmethod
     async def verify_email(db: AsyncSession, email: str, otp: str):
-        redis = await cache.get_client()
+        redis = cache.get_client()
         redis_data = await redis.get(f"verify_email:{email}")
         
         if not redis_data: